@@ -0,0 +1,71 @@
+"""
+Compares the throughput of a CPU-bound command run on threads and on the process pool,
+with an increasing number of clients. Run with `python3 benchmarks/process_pool_benchmark.py`
+from the root directory.
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import gpcp
+
+HOST = "127.0.0.1"
+PORT = 9200
+FIBONACCI_N = 24
+CALLS_PER_CLIENT = 20
+
+def fib(x):
+    if x < 2:
+        return 1
+    return fib(x-1) + fib(x-2)
+
+class BenchmarkHandler(gpcp.BaseHandler):
+    @gpcp.command
+    def fibonacciThread(self, i: int) -> int:
+        return fib(i)
+
+    @gpcp.command(executor="process")
+    def fibonacciProcess(self, i: int) -> int:
+        return fib(i)
+
+def runClient(command: str):
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+        for _ in range(CALLS_PER_CLIENT):
+            getattr(client, command)(FIBONACCI_N)
+
+def measure(command: str, clients: int) -> float:
+    threads = [threading.Thread(target=runClient, args=(command,)) for _ in range(clients)]
+    startTime = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients * CALLS_PER_CLIENT / (time.perf_counter() - startTime)
+
+def main():
+    cpus = os.cpu_count() or 1
+    server = gpcp.Server(handler=BenchmarkHandler, workers=cpus * 2)
+    serverThread = threading.Thread(target=server.startServer, args=(HOST, PORT))
+    serverThread.start()
+    time.sleep(0.1)
+
+    measure("fibonacciProcess", cpus) # warm up the process pool
+    print(f"fibonacci({FIBONACCI_N}), {CALLS_PER_CLIENT} calls per client, {cpus} CPUs")
+    print(f"{'clients':>8} {'thread calls/s':>15} {'process calls/s':>16} {'process scaling':>16}")
+    baseline = None
+    clients = 1
+    while clients <= cpus:
+        threadRate = measure("fibonacciThread", clients)
+        processRate = measure("fibonacciProcess", clients)
+        baseline = baseline or processRate
+        print(f"{clients:>8} {threadRate:>15.1f} {processRate:>16.1f} {processRate / baseline:>15.2f}x")
+        clients *= 2
+
+    server.stopServer()
+    serverThread.join()
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,5 @@
 from gpcp.client import Client
 from gpcp.server import Server
 from gpcp.core.base_handler import BaseHandler
-from gpcp.utils.annotations import command, unknownCommand
\ No newline at end of file
+from gpcp.utils.annotations import command, unknownCommand
+from gpcp import aio
\ No newline at end of file
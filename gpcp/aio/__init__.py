@@ -0,0 +1,3 @@
+# asyncio implementation of gpcp, speaking the same protocol as gpcp.Server and gpcp.Client
+from gpcp.aio.client import Client
+from gpcp.aio.server import Server
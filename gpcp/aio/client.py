@@ -0,0 +1,65 @@
+from gpcp.utils.handlerValidator import validateNullableHandler
+from gpcp.utils.errors import ConfigurationError
+from gpcp.aio.endpoint import EndPoint
+import asyncio
+
+import logging
+logger = logging.getLogger(__name__)
+
+class Client(EndPoint):
+    """
+    gpcp asyncio client main class, used for creating and using a client:
+
+    async with gpcp.aio.Client(host, port) as client:
+        await client.loadInterface(client)
+        await client.someCommand()
+    """
+
+    def __init__(self, host: str, port: int, role: str = "A", handler = None):
+        """
+        Prepare a client, the connection is opened with `connect()` or by entering an `async with`
+
+        :param host: the host server ip or address
+        :param port: the port on the host server
+        :param role: the role of the client endpoint
+        :param handler: the handler class, usually extending utils.base_handler.BaseHandler
+        """
+
+        logger.info(f"__init__() called with host={host}, port={port}, role={role}, handler={handler}")
+
+        if not isinstance(host, str):
+            raise ConfigurationError(f"invalid option '{host}' for host, must be string")
+        if not isinstance(port, int):
+            raise ConfigurationError(f"invalid option '{port}' for port, must be integer")
+        if role not in ["R", "A", "AR", "RA"]:
+            raise ConfigurationError(f"invalid role \"{role}\" for {self.__class__.__name__}: options are ['A', 'R', 'RA' | 'AR']")
+
+        # creating handler instance
+        validatedHandler = validateNullableHandler(handler)
+        if validatedHandler is None:
+            handlerInstance = None
+        else:
+            handlerInstance = validatedHandler()
+
+        self.host = host
+        self.port = port
+        super().__init__(None, role, handlerInstance)
+
+    async def connect(self):
+        """
+        Connect to the server
+
+        :returns: self
+        """
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if not await self._start(reader, writer):
+            raise ConnectionError(f"could not establish a connection with {self.host}:{self.port}")
+        return self
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.closeConnection()
+        return False # let the caller handle exceptions
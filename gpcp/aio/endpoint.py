@@ -0,0 +1,245 @@
+from collections import deque
+from typing import Union
+import asyncio
+import logging
+import json
+from gpcp.utils.base_types import getFromId
+from gpcp.core.endpoint import checkRemoteConfig
+from gpcp.core import codec
+from gpcp.aio.packet import sendAll, receiveAll
+
+logger = logging.getLogger(__name__)
+
+class EndPoint():
+
+    def __init__(self, server, validatedRole: str, handlerInstance, executor = None):
+        """
+        initializes this endpoint, the connection is then set up with `_start()`
+
+        :param server: the `gpcp.aio.Server` this endpoint belongs to, can be None if
+                       this endpoint belongs to a client
+        :param validatedRole:str: the role of this endpoint, already validated
+        :param handlerInstance: the handler instance
+        :param executor: the executor used to run synchronous commands, None to use the
+                         default executor of the running loop
+        """
+        self._stop = False
+        self._server = server
+        self._isServer = server is not None
+        self._executor = executor
+        self.role = validatedRole
+        self.handler = handlerInstance
+        self.reader = None
+        self.writer = None
+        self.localAddress = None
+        self.remoteAddress = None
+        self.codec = codec.JsonCodec
+
+        # futures waiting for a response, responses come in the same order as requests
+        self._pending = deque()
+
+    async def _start(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        exchanges the initial config with the remote endpoint, starts the receiver and
+        main loop tasks and then notifies the handler with onConnected()
+
+        :returns: whether the connection was established successfully
+        """
+        self.reader = reader
+        self.writer = writer
+        self.localAddress = writer.get_extra_info("sockname")
+        self.remoteAddress = writer.get_extra_info("peername")
+
+        # setting up initial data to send
+        config = json.dumps({
+            "role": self.role,
+            "codecs": codec.supportedCodecs(),
+        })
+
+        # initial data transfer
+        await sendAll(self.writer, config)
+        logger.debug(f"remote config sent to {self.remoteAddress}: {config}")
+        data, _ = await receiveAll(self.reader)
+        if data is None:
+            logger.warning(f"connection {self.remoteAddress} closed before sending its config")
+            self._stop = True
+            self.writer.close()
+            return False
+        remoteConfig = json.loads(data)
+        logger.debug(f"remote config recieved on {self.localAddress}: {remoteConfig}")
+
+        if not checkRemoteConfig(self.role, remoteConfig, self.localAddress, self.remoteAddress):
+            self._stop = True
+            self.writer.close()
+            return False
+
+        # locking the handler if needed
+        if self.handler is not None:
+            self.handler._LOCK = self.role == "A"
+
+        self.codec = codec.negotiate(remoteConfig)
+        logger.debug(f"using codec {self.codec.NAME} with {self.remoteAddress}")
+
+        self._requests = asyncio.Queue()
+        self._receiverTask = asyncio.ensure_future(self._receiver())
+        self._mainLoopTask = asyncio.ensure_future(self.mainLoop())
+        if self.handler is not None:
+            self.handler.onConnected(self._server, self, self.remoteAddress)
+        return True
+
+    async def _receiver(self):
+        try:
+            while not self._stop:
+                data, isRequest = await receiveAll(self.reader)
+
+                if data is None: # connection was closed
+                    logger.debug(f"received None, terminating connection {self.remoteAddress}")
+                    break
+                elif isRequest:
+                    self._requests.put_nowait(data)
+                elif self._pending:
+                    future = self._pending.popleft()
+                    if not future.done():
+                        future.set_result(data)
+                else:
+                    logger.warning(f"unexpected response from {self.remoteAddress}: {data}")
+        except (ConnectionError, OSError) as e:
+            logger.error(f"{e} encountered while receiving data from {self.remoteAddress}")
+
+        # the connection is closed from another task, since this one would be cancelled
+        asyncio.ensure_future(self.closeConnection())
+
+    async def mainLoop(self):
+        while not self._stop:
+            # wait for a request to come
+            data = await self._requests.get()
+
+            logger.debug(f"received data from {self.remoteAddress}")
+            response = await self.handler.handleDataAsync(data, self._executor, self.codec)
+            if self.handler._LOCK is True:
+                logger.warning(f"unexpected request with data={data} while handler locked from {self.remoteAddress}")
+
+            try:
+                await sendAll(self.writer, response)
+            except (ConnectionError, OSError) as e:
+                logger.error(f"{e} encountered while sending data to {self.remoteAddress}, closing connection")
+                asyncio.ensure_future(self.closeConnection())
+                break
+
+    async def closeConnection(self):
+        """
+        Closes the connection to the other end point, cancelling its tasks and
+        failing all the requests still waiting for a response
+        """
+
+        logger.info(f"closeConnection() called on {self.remoteAddress}")
+
+        if self._stop:
+            logger.info(f"closeConnection() ignored since endpoint already stopped")
+            return
+        self._stop = True
+
+        currentTask = asyncio.current_task()
+        for task in (self._receiverTask, self._mainLoopTask):
+            if task is not currentTask:
+                task.cancel()
+
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(ConnectionError("Did not get a response"))
+
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass # the connection was already broken
+
+        if self._server is not None:
+            self._server._unregisterEndpoint(self)
+
+    def isStopped(self):
+        return self._stop
+
+    async def loadInterface(self, namespace: type, rawInterface: list = None):
+        """
+        Retrieve and load the remote interface and make it available to
+        the user with `await <namespace>.<command>(*args)`, usually
+        namespace is the same as the main class. See
+        `gpcp.core.endpoint.EndPoint.loadInterface` for the format of
+        rawInterface.
+
+        :param namespace: the object where the commands will be loaded
+        :param rawInterface: raw interface string or dict to load. If None the interface
+            will be loaded from the server by calling the command `requestCommands()`
+        """
+
+        logger.debug(f"loadInterface() called with namespace={namespace}, rawInterface={rawInterface}")
+
+        if rawInterface is None:
+            #request the raw interface if not provided
+            rawInterface = await self.commandRequest("requestCommands", [])
+
+        if isinstance(rawInterface, (bytes, str)):
+            rawInterface = json.loads(rawInterface)
+
+        for command in rawInterface:
+            def generateWrapperFunction():
+                #declaring handler coroutine
+                async def wrapper(*args):
+                    arguments = []
+                    for i, arg in enumerate(args):
+                        arguments.append(wrapper.argumentTypes[i].serialize(arg))
+                    command = wrapper.commandIdentifier
+                    if self.codec.usesCommandIds and wrapper.commandId is not None:
+                        command = wrapper.commandId
+                    returnedData = await self.commandRequest(command, arguments)
+                    if wrapper.stream:
+                        # streams are not supported here, so all the items are received at once
+                        return iter([wrapper.returnType.deserialize(item) for item in returnedData])
+                    return wrapper.returnType.deserialize(returnedData)
+                return wrapper
+
+            wrapper = generateWrapperFunction()
+
+            #setting up handler method data
+            wrapper.commandIdentifier = command["name"]
+            wrapper.commandId = command.get("id")
+            wrapper.stream = command.get("stream", False)
+            wrapper.argumentTypes = [getFromId(arg["type"]) for arg in command["arguments"]]
+            wrapper.returnType = getFromId(command["return_type"])
+            wrapper.__doc__ = command["description"]
+
+            logger.debug(f"loaded command with commandIdentifier={wrapper.commandIdentifier}, description=\"{wrapper.__doc__}\""
+                         + f", argumentTypes={wrapper.argumentTypes}, returnType={wrapper.returnType}")
+            #assigning the method to the namespace class
+            setattr(namespace, command["name"], wrapper)
+
+    async def commandRequest(self, commandIdentifier: Union[str, int], arguments: list):
+        """
+        Format a command request with given arguments, send it and return the response,
+        decoded into a Python object using the negotiated codec. Many coroutines can
+        await requests on the same endpoint concurrently.
+
+        :param arguments: list of all arguments to send to the server
+        :param commandIdentifier: the name of the command to call, or its id in the
+            `requestCommands` table if `self.codec.usesCommandIds`
+        """
+
+        logger.debug(f"commandRequest() called with commandIdentifier={commandIdentifier}, arguments={arguments}")
+
+        if self._stop:
+            raise ConnectionError("endpoint is not connected")
+
+        # format the command into a valid request
+        data = self.codec.encodeRequest(commandIdentifier, arguments)
+        # the future is enqueued right before sending, without awaiting in between
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        await sendAll(self.writer, data, isRequest=True)
+        # wait for the receiver to resolve the future with the response
+        response = await future
+
+        result = self.codec.decodeValue(response)
+        logger.debug(f"commandRequest() received result={result}")
+        return result
@@ -0,0 +1,43 @@
+"""asyncio counterpart of `gpcp.core.packet`, using the very same wire format"""
+from typing import Union, Tuple
+import asyncio
+import logging
+from gpcp.core.packet import Header, HEADER_LENGTH, ENCODING
+
+logger = logging.getLogger(__name__)
+
+async def sendAll(writer: asyncio.StreamWriter, data: Union[bytes, str, list], isRequest: bool = False):
+    """
+    sends all data, waiting for the transport buffer to be drained
+
+    :param writer: the stream where to send the data
+    :param data: the data to send, or a list of segments sent one after the other in the same frame
+    """
+
+    if isinstance(data, str):
+        data = data.encode(ENCODING)
+    buffers = data if isinstance(data, list) else [data]
+
+    # header and data are written without awaiting in between, so that
+    # frames sent by different coroutines never get interleaved
+    writer.write(Header.encode(sum(len(buffer) for buffer in buffers), isRequest))
+    for buffer in buffers:
+        writer.write(buffer)
+    await writer.drain()
+
+async def receiveAll(reader: asyncio.StreamReader) -> Tuple[Union[bytes, None], Union[bool, None]]:
+    """
+    recieves all data of a single frame from a stream
+
+    :param reader: the stream where recieve data
+    :returns: (data, isRequest), or (None, None) if the connection was closed
+    """
+
+    try:
+        head = await reader.readexactly(HEADER_LENGTH)
+        byteCount, isRequest = Header.decode(head)
+        data = await reader.readexactly(byteCount)
+    except asyncio.IncompleteReadError:
+        return (None, None)
+
+    return (data, isRequest)
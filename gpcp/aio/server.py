@@ -0,0 +1,153 @@
+from gpcp.utils.handlerValidator import validateHandler, validateNullableHandler
+from gpcp.utils.errors import ConfigurationError
+from gpcp.aio.endpoint import EndPoint
+from gpcp.aio.packet import sendAll
+from gpcp.core import process_pool
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Callable
+import threading
+import asyncio
+
+import logging
+logger = logging.getLogger(__name__)
+
+class Server:
+    """
+    gpcp asyncio server main class: every connection is served by tasks running on
+    a single event loop instead of by dedicated threads
+    """
+
+    def __init__(self, role = "R", handler: Union[type, Callable] = None, reuseAddress: bool = False,
+                 workers: int = None):
+        """
+        Initialize server
+
+        :param role: the role of the server endpoints
+        :param handler: the handler class, usually extending utils.base_handler.BaseHandler
+        :param reuseAddress: set if overwrite server on the same port with the current one
+        :param workers: the number of threads used to run synchronous (i.e. not `async def`)
+                        commands, None to let `concurrent.futures.ThreadPoolExecutor` decide
+        """
+
+        logger.debug(f"__init__() called with role={role}, handler={handler}, reuseAddress={reuseAddress}, workers={workers}")
+
+        if role not in ["R", "A", "AR", "RA"]:
+            raise ConfigurationError(f"invalid role for {self.__class__.__name__}: options are ['A', 'R', 'RA' | 'AR']")
+        self.role = role
+
+        self.handler = validateNullableHandler(handler)
+
+        if not isinstance(reuseAddress, bool):
+            raise ConfigurationError(f"invalid option '{reuseAddress}' for reuseAddress, must be 'True' or 'False'")
+        self.reuseAddress = reuseAddress
+
+        if workers is not None and (not isinstance(workers, int) or workers <= 0):
+            raise ConfigurationError(f"invalid option '{workers}' for workers, must be a positive integer or None")
+        self.workers = workers
+
+        self.connectedEndpoints = set()
+        self.running = threading.Event()
+        self._loop = None
+        self._stopEvent = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        self.stopServer()
+        return False # let the caller handle exceptions
+
+    def setHandler(self, handler: Union[type, Callable]):
+        """
+        Sets the handler class used as a factory to instantiate a handler for every connection
+
+        :param handler: the handler class, usually extending utils.base_handler.BaseHandler
+        """
+
+        logger.debug(f"setHandler() called with handler={handler}")
+
+        self.handler = validateHandler(handler)
+
+    async def startServer(self, host: str, port: int, buffer: int = 128):
+        """
+        start the server and open it for connections, returns only after `stopServer()`
+        is called and all connections have been closed
+
+        :param host: address or ip to bind the server to
+        :param port: port where bind the server
+        :param buffer: how many connections can be buffered at the same time
+        :returns: self
+        """
+
+        logger.info(f"startServer() called with host={host}, port={port}, buffer={buffer}")
+
+        if not isinstance(host, str):
+            raise ConfigurationError(f"invalid option '{host}' for host, must be string")
+        if not isinstance(port, int):
+            raise ConfigurationError(f"invalid option '{port}' for port, must be integer")
+        if not isinstance(buffer, int):
+            raise ConfigurationError(f"invalid option '{buffer}' for buffer, must be integer")
+        if self.handler is None:
+            raise ConfigurationError(f"'startServer' can be used only after a handler is assigned")
+        if self.running.is_set():
+            raise ValueError(f"server is already running, cannot start another one with the same object")
+
+        self._loop = asyncio.get_running_loop()
+        self._stopEvent = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gpcp worker")
+
+        # start the server
+        server = await asyncio.start_server(self._onConnection, host, port,
+                                            backlog=buffer, reuse_address=self.reuseAddress)
+        process_pool.acquire()
+        self.running.set()
+        try:
+            await self._stopEvent.wait()
+        finally:
+            # closing all connections, after stopServer() was called
+            server.close()
+            for endpoint in list(self.connectedEndpoints):
+                await self._terminateEndpoint(endpoint)
+            self.connectedEndpoints.clear()
+            await server.wait_closed()
+
+            self._executor.shutdown(wait=True)
+            process_pool.release()
+            self.running.clear()
+
+        return self
+
+    async def _onConnection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        logger.info(f"new connection: {writer.get_extra_info('peername')}")
+
+        # Create a new handler using handler as a factory, see `gpcp.Server.startServer()`
+        endpoint = EndPoint(self, self.role, self.handler(), self._executor)
+        try:
+            if await endpoint._start(reader, writer):
+                self.connectedEndpoints.add(endpoint)
+        except (ConnectionError, OSError) as e:
+            logger.error(f"{e} encountered while setting up connection {endpoint.remoteAddress}")
+            writer.close()
+
+    def _unregisterEndpoint(self, endpoint: EndPoint):
+        self.connectedEndpoints.discard(endpoint)
+
+    async def _terminateEndpoint(self, endpoint: EndPoint):
+        data = endpoint.handler.onDisonnected(self, endpoint, endpoint.remoteAddress)
+        if data is not None:
+            try:
+                await sendAll(endpoint.writer, data)
+            except (ConnectionError, OSError) as e:
+                logger.error(f"{e} encountered while sending onDisconnected packet to {endpoint.remoteAddress}")
+
+        await endpoint.closeConnection()
+        logger.debug(f"endpoint {endpoint.remoteAddress} terminated successfully")
+
+    def stopServer(self):
+        """
+        Shuts down the server, can be called from any thread
+        """
+
+        logger.info(f"stopServer() called")
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopEvent.set)
@@ -2,7 +2,10 @@ from gpcp.utils.errors import HandlerLoadingError, UnmetPreconditionError
 from gpcp.utils.annotations import command, unknownCommand, FunctionType
 from gpcp.utils.base_types import toId, JsonObject, Bytes
 from typing import Callable, Union
-from gpcp.core import packet
+from gpcp.core.codec import JsonCodec
+from gpcp.core.stream import ResponseStream
+from gpcp.core import process_pool
+import asyncio
 import json
 
 import logging
@@ -56,15 +59,17 @@ class BaseHandler:
 
             if functionType == FunctionType.command:
                 # func.__gpcp_metadata__ = (command, <command trigger>, <description>, <return type>
-                #   [(<param 1 type>, <param 1 name>), (<param 2 type>, <param 2 name>), ...])
-                commandTrigger, description, returnType, arguments = func.__gpcp_metadata__[1:]
+                #   [(<param 1 type>, <param 1 name>), (<param 2 type>, <param 2 name>), ...], <options>)
+                commandTrigger, description, returnType, arguments, options = func.__gpcp_metadata__[1:]
 
                 if commandTrigger in cls.commandFunctions:
                     raise HandlerLoadingError(
                         f"tried to load twice the same command '{commandTrigger}', already " +
                         f"registered and mapped to function '{cls.commandFunctions[commandTrigger][0].__name__}'"
                     )
-                cls.commandFunctions[commandTrigger] = (func, description, returnType, arguments)
+                if options["executor"] == "process":
+                    cls._assertRunnableInProcess(func, options)
+                cls.commandFunctions[commandTrigger] = (func, description, returnType, arguments, options)
 
             elif functionType == FunctionType.unknown:
                 # func.__gpcp_metadata__ = (unknown,)
@@ -84,21 +89,83 @@ class BaseHandler:
                     + f" and {len(cls.commandFunctions)} commandFunctions "
                     + str([f[0].__name__ for f in cls.commandFunctions.values()]))
 
-    def handleData(self, data: Union[bytes, str]):
+        # the id of a command is its index in the table returned by `requestCommands`
+        cls.commandTriggers = list(cls.commandFunctions)
+
+    @classmethod
+    def _assertRunnableInProcess(cls, func: Callable, options: dict):
+        if asyncio.iscoroutinefunction(func):
+            raise HandlerLoadingError(f"command '{func.__name__}' is a coroutine and can't be run in a process")
+        if options["stream"]:
+            raise HandlerLoadingError(f"command '{func.__name__}' returns an iterator and can't be run in a process")
+        try:
+            process_pool.assertPicklable(cls, func)
+        except Exception as e:
+            raise HandlerLoadingError(
+                f"command '{func.__name__}' can't be run in a process, since it or the handler class " +
+                f"'{cls.__name__}' can't be pickled (is it defined at the top level of a module?): {e}"
+            ) from e
+
+    def handleData(self, data: Union[bytes, str], codec = JsonCodec):
         """
         calls the corrispondent handler function from a given request
+
+        :param data: the request data
+        :param codec: the `gpcp.core.codec` codec negotiated with the remote endpoint,
+                      used to decode the request and to encode the response
+        :returns: the encoded response, or a `gpcp.core.stream.ResponseStream`
+                  for commands returning an iterator
         """
 
         logger.debug(f"handleData called on {self.__class__.__name__} with data={data}")
         # checking if handler is locked
         if self._LOCK is True:
-            return json.dumps("ENDPOINT NOT STARTED TO THIS SCOPE")
+            return codec.encodeValue("ENDPOINT NOT STARTED TO THIS SCOPE")
 
-        commandIdentifier, arguments = packet.CommandData.decode(data)
+        commandIdentifier, arguments = self._decodeRequest(data, codec)
         logger.debug(f"commandIdentifier={commandIdentifier} and arguments={arguments}")
+        return self._handleCommand(commandIdentifier, arguments, codec)
+
+    async def handleDataAsync(self, data: Union[bytes, str], executor = None, codec = JsonCodec):
+        """
+        coroutine version of `handleData`, used by `gpcp.aio` endpoints: commands defined
+        with `async def` are awaited directly, while the others are run in `executor`
+        (or in the default executor of the running loop if None)
+
+        :param data: the request data
+        :param executor: the `concurrent.futures.Executor` used to run synchronous commands
+        :param codec: the codec negotiated with the remote endpoint, see `handleData`
+        """
+
+        logger.debug(f"handleDataAsync called on {self.__class__.__name__} with data={data}")
+        if self._LOCK is True:
+            return codec.encodeValue("ENDPOINT NOT STARTED TO THIS SCOPE")
+
+        commandIdentifier, arguments = self._decodeRequest(data, codec)
+        commandFunction = self.commandFunctions.get(commandIdentifier)
+        if commandFunction is None or not asyncio.iscoroutinefunction(commandFunction[0]):
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(executor, self._handleCommand, commandIdentifier, arguments, codec)
+            if isinstance(response, ResponseStream):
+                # `gpcp.aio` endpoints do not support streams, so all items are sent at once
+                response = await loop.run_in_executor(executor, response.collect)
+            return response
+
+        function, _, returnType, argumentTypes, _ = commandFunction
+        returnValue = await function(self, *self._convertArguments(arguments, argumentTypes))
+        logger.debug(f"return value for command {commandIdentifier}: {returnValue}")
+        return codec.encodeValue(returnType.serialize(returnValue))
+
+    def _decodeRequest(self, data: Union[bytes, str], codec) -> tuple:
+        commandIdentifier, arguments = codec.decodeRequest(data)
+        if isinstance(commandIdentifier, int) and 0 <= commandIdentifier < len(self.commandTriggers):
+            # the command was referenced by its id in the `requestCommands` table
+            commandIdentifier = self.commandTriggers[commandIdentifier]
+        return (commandIdentifier, arguments)
 
+    def _handleCommand(self, commandIdentifier: str, arguments: list, codec = JsonCodec):
         try:
-            function, _, returnType, argumentTypes = self.commandFunctions[commandIdentifier]
+            function, _, returnType, argumentTypes, options = self.commandFunctions[commandIdentifier]
         except KeyError:
             logger.info(f"unknown command {commandIdentifier}")
             if self.unknownCommandFunction is None:
@@ -108,21 +175,33 @@ class BaseHandler:
                 returnValue = self.unknownCommandFunction(commandIdentifier, arguments)
                 if not isinstance(returnValue, bytes):
                     raise UnmetPreconditionError(f"return value is not bytes: {returnValue}")
-            returnValueJson = json.dumps(Bytes.serialize(returnValue))
-            return returnValueJson
+            return codec.encodeValue(Bytes.serialize(returnValue))
+
+        convertedArguments = self._convertArguments(arguments, argumentTypes)
+        if options["executor"] == "process":
+            returnValue = process_pool.runCommand(self.__class__, function, convertedArguments)
+        else:
+            returnValue = function(self, *convertedArguments)
+
+        if options["stream"]:
+            # items are serialized and encoded while being sent
+            logger.debug(f"streaming return value for command {commandIdentifier}")
+            return ResponseStream(returnValue, returnType, codec)
+
+        # convert the return value to `bytes` from the specified type
+        logger.debug(f"return value for command {commandIdentifier}: {returnValue}")
+        encodedReturnValue = codec.encodeValue(returnType.serialize(returnValue))
+        logger.debug(f"encoded return value for command {commandIdentifier}: {encodedReturnValue}")
+        return encodedReturnValue
 
+    @staticmethod
+    def _convertArguments(arguments: list, argumentTypes: list) -> list:
         # convert parameters from `bytes` to the types of `function` arguments
         convertedArguments = []
         for i, argument in enumerate(arguments):
             argType, _ = argumentTypes[i]
             convertedArguments.append(argType.deserialize(argument))
-
-        # convert the return value to `bytes` from the specified type
-        returnValue = function(self, *convertedArguments)
-        logger.debug(f"return value for command {commandIdentifier}: {returnValue}")
-        returnValueJson = json.dumps(returnType.serialize(returnValue))
-        logger.debug(f"return value json for command {commandIdentifier}: {returnValueJson}")
-        return returnValueJson
+        return convertedArguments
 
     @command
     def requestCommands(self) -> JsonObject:
@@ -133,14 +212,16 @@ class BaseHandler:
         logger.debug(f"requestCommands called")
 
         serializedCommands = []
-        for commandTrigger, metadata in self.commandFunctions.items():
-            _, description, returnType, arguments = metadata
+        for commandId, (commandTrigger, metadata) in enumerate(self.commandFunctions.items()):
+            _, description, returnType, arguments, options = metadata
 
             serializedCommands.append({
                 "name": commandTrigger,
+                "id": commandId,
                 "arguments": [{"name": argName, "type": toId(argType)}
                               for argType, argName in arguments],
                 "return_type": toId(returnType),
+                "stream": options["stream"],
                 "description": description,
             })
 
@@ -0,0 +1,274 @@
+"""
+codecs used to encode the payloads of requests and responses. The codec used on a
+connection is negotiated in the initial config: every endpoint sends the names of the
+codecs it supports in "codecs", and both pick the first one in `PREFERENCE` supported
+by the other end. Endpoints not sending "codecs" only support the json codec.
+"""
+from typing import Union, Tuple
+import struct
+import json
+from gpcp.core import packet
+
+class JsonCodec:
+    """
+    the original text protocol: requests are `commandIdentifier + json.dumps(arguments)`
+    and responses are `json.dumps(returnValue)`
+    """
+
+    NAME = "json"
+    # whether requests can reference commands by their id in the `requestCommands` table
+    usesCommandIds = False
+
+    @staticmethod
+    def encodeRequest(commandIdentifier: str, arguments: list) -> bytes:
+        return packet.CommandData.encode(commandIdentifier, arguments)
+
+    @staticmethod
+    def decodeRequest(data: Union[bytes, str]) -> Tuple[str, list]:
+        return packet.CommandData.decode(data)
+
+    @staticmethod
+    def encodeValue(value) -> bytes:
+        return json.dumps(value, default=packet.jsonDefault).encode(packet.ENCODING)
+
+    @staticmethod
+    def decodeValue(data: Union[bytes, memoryview]):
+        if not isinstance(data, str):
+            data = str(data, packet.ENCODING)
+        return json.loads(data)
+
+class BinaryCodec:
+    """
+    compact binary protocol: every value is a type tag (1 byte) followed by its content,
+    i.e. a fixed size big endian number, or a length and then the content for strings,
+    bytes, lists and dicts. Requests are the command (its integer id in the `requestCommands`
+    table, or its name) followed by the list of arguments. Bytes are sent raw, without any
+    text conversion, and are decoded as `bytes`.
+    """
+
+    NAME = "binary"
+    usesCommandIds = True
+
+    # type tags, DO NOT MODIFY unless you also change them in all other implementations
+    NONE = 0
+    FALSE = 1
+    TRUE = 2
+    INT8 = 3
+    INT32 = 4
+    INT64 = 5
+    BIGINT = 6 # length (4 bytes) + signed big endian bytes
+    FLOAT = 7
+    SHORT_STRING = 8 # length (1 byte) + utf-8 bytes
+    STRING = 9 # length (4 bytes) + utf-8 bytes
+    BYTES = 10 # length (4 bytes) + bytes
+    LIST = 11 # item count (4 bytes) + items
+    DICT = 12 # item count (4 bytes) + key, value, key, value...
+
+    _INT8 = struct.Struct(">b")
+    _INT32 = struct.Struct(">i")
+    _INT64 = struct.Struct(">q")
+    _FLOAT = struct.Struct(">d")
+    _LENGTH = struct.Struct(">I")
+
+    # bytes values at least this big are not copied into the encoded data
+    OUT_OF_BAND_SIZE = 16 * 1024
+
+    @staticmethod
+    def encodeRequest(command: Union[str, int], arguments: list) -> Union[bytes, list]:
+        """
+        :param command: the command name or its id in the `requestCommands` table
+        :param arguments: list of all arguments
+        :returns: the encoded request, see `encodeValue()`
+        """
+        segments = [bytearray()]
+        BinaryCodec._encode(command, segments)
+        BinaryCodec._encode(arguments, segments)
+        return BinaryCodec._join(segments)
+
+    @staticmethod
+    def decodeRequest(data: Union[bytes, memoryview]) -> Tuple[Union[str, int], list]:
+        """
+        :returns: (command, arguments), where command is a name or an id
+        """
+        command, offset = BinaryCodec._decode(data, 0)
+        arguments, _ = BinaryCodec._decode(data, offset)
+        return (command, arguments)
+
+    @staticmethod
+    def encodeValue(value) -> Union[bytes, list]:
+        """
+        :returns: the encoded value, or a list of segments to be sent one after the other
+                  in the same frame if `value` contains bytes of at least `OUT_OF_BAND_SIZE`,
+                  which are not copied but referenced directly by their own segment
+        """
+        segments = [bytearray()]
+        BinaryCodec._encode(value, segments)
+        return BinaryCodec._join(segments)
+
+    @staticmethod
+    def _join(segments: list) -> Union[bytes, list]:
+        if len(segments) == 1:
+            return bytes(segments[0])
+        return [segment for segment in segments if len(segment) > 0]
+
+    @staticmethod
+    def decodeValue(data: Union[bytes, memoryview]):
+        value, offset = BinaryCodec._decode(data, 0)
+        if offset != len(data):
+            raise ValueError(f"{len(data) - offset} bytes of extra data after binary value")
+        return value
+
+    @staticmethod
+    def _encode(value, segments: list):
+        # values are appended to the last segment, since segments can be added by bytes values
+        out = segments[-1]
+
+        # exact type checks first, since they are the fastest and cover almost all values
+        valueType = type(value)
+        if valueType is int:
+            if -0x80 <= value < 0x80:
+                out.append(BinaryCodec.INT8)
+                out += BinaryCodec._INT8.pack(value)
+            elif -0x80000000 <= value < 0x80000000:
+                out.append(BinaryCodec.INT32)
+                out += BinaryCodec._INT32.pack(value)
+            elif -0x8000000000000000 <= value < 0x8000000000000000:
+                out.append(BinaryCodec.INT64)
+                out += BinaryCodec._INT64.pack(value)
+            else:
+                encoded = value.to_bytes(value.bit_length() // 8 + 1, "big", signed=True)
+                out.append(BinaryCodec.BIGINT)
+                out += BinaryCodec._LENGTH.pack(len(encoded))
+                out += encoded
+
+        elif valueType is str:
+            encoded = value.encode(packet.ENCODING)
+            if len(encoded) < 0x100:
+                out.append(BinaryCodec.SHORT_STRING)
+                out.append(len(encoded))
+            else:
+                out.append(BinaryCodec.STRING)
+                out += BinaryCodec._LENGTH.pack(len(encoded))
+            out += encoded
+
+        elif valueType is float:
+            out.append(BinaryCodec.FLOAT)
+            out += BinaryCodec._FLOAT.pack(value)
+
+        elif value is None:
+            out.append(BinaryCodec.NONE)
+        elif value is True:
+            out.append(BinaryCodec.TRUE)
+        elif value is False:
+            out.append(BinaryCodec.FALSE)
+
+        elif isinstance(value, (list, tuple)):
+            out.append(BinaryCodec.LIST)
+            out += BinaryCodec._LENGTH.pack(len(value))
+            for item in value:
+                BinaryCodec._encode(item, segments)
+
+        elif isinstance(value, dict):
+            out.append(BinaryCodec.DICT)
+            out += BinaryCodec._LENGTH.pack(len(value))
+            for key, item in value.items():
+                BinaryCodec._encode(key, segments)
+                BinaryCodec._encode(item, segments)
+
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            value = memoryview(value).cast("B")
+            out.append(BinaryCodec.BYTES)
+            out += BinaryCodec._LENGTH.pack(len(value))
+            if len(value) < BinaryCodec.OUT_OF_BAND_SIZE:
+                out += value
+            else:
+                # sent as is with scatter-gather I/O, the next values go in a new segment
+                segments.append(value)
+                segments.append(bytearray())
+
+        # subclasses of the builtin types, e.g. enum.IntEnum
+        elif isinstance(value, int):
+            BinaryCodec._encode(int(value), segments)
+        elif isinstance(value, float):
+            BinaryCodec._encode(float(value), segments)
+        elif isinstance(value, str):
+            BinaryCodec._encode(str(value), segments)
+
+        else:
+            raise TypeError(f"Object of type {valueType.__name__} is not serializable with the binary codec")
+
+    @staticmethod
+    def _decode(data: Union[bytes, memoryview], offset: int):
+        """
+        :returns: (value, offset of the first byte after the value)
+        """
+        tag = data[offset]
+        offset += 1
+
+        if tag == BinaryCodec.INT8:
+            return (BinaryCodec._INT8.unpack_from(data, offset)[0], offset + 1)
+        elif tag == BinaryCodec.SHORT_STRING:
+            end = offset + 1 + data[offset]
+            return (str(data[offset + 1:end], packet.ENCODING), end)
+        elif tag == BinaryCodec.INT32:
+            return (BinaryCodec._INT32.unpack_from(data, offset)[0], offset + 4)
+        elif tag == BinaryCodec.FLOAT:
+            return (BinaryCodec._FLOAT.unpack_from(data, offset)[0], offset + 8)
+        elif tag == BinaryCodec.LIST:
+            count = BinaryCodec._LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            items = []
+            for _ in range(count):
+                item, offset = BinaryCodec._decode(data, offset)
+                items.append(item)
+            return (items, offset)
+        elif tag == BinaryCodec.NONE:
+            return (None, offset)
+        elif tag == BinaryCodec.TRUE:
+            return (True, offset)
+        elif tag == BinaryCodec.FALSE:
+            return (False, offset)
+        elif tag == BinaryCodec.INT64:
+            return (BinaryCodec._INT64.unpack_from(data, offset)[0], offset + 8)
+        elif tag == BinaryCodec.DICT:
+            count = BinaryCodec._LENGTH.unpack_from(data, offset)[0]
+            offset += 4
+            items = {}
+            for _ in range(count):
+                key, offset = BinaryCodec._decode(data, offset)
+                items[key], offset = BinaryCodec._decode(data, offset)
+            return (items, offset)
+
+        # all the remaining types are length-prefixed
+        length = BinaryCodec._LENGTH.unpack_from(data, offset)[0]
+        offset += 4
+        end = offset + length
+        if end > len(data):
+            raise ValueError(f"truncated binary value: {length} bytes expected, {len(data) - offset} found")
+        if tag == BinaryCodec.STRING:
+            return (str(data[offset:end], packet.ENCODING), end)
+        elif tag == BinaryCodec.BYTES:
+            return (bytes(data[offset:end]), end)
+        elif tag == BinaryCodec.BIGINT:
+            return (int.from_bytes(data[offset:end], "big", signed=True), end)
+        raise ValueError(f"invalid binary value tag {tag}")
+
+# DO NOT MODIFY THE ORDER OF THIS ARRAY unless you also change it in all other implementations
+PREFERENCE = [BinaryCodec, JsonCodec]
+
+def supportedCodecs() -> list:
+    """
+    :returns: the names of the supported codecs, to be sent in the initial config
+    """
+    return [codec.NAME for codec in PREFERENCE]
+
+def negotiate(remoteConfig: dict):
+    """
+    :param remoteConfig: the config received from the remote endpoint
+    :returns: the codec to use to talk to the remote endpoint
+    """
+    remoteCodecs = remoteConfig.get("codecs", [JsonCodec.NAME])
+    for codec in PREFERENCE:
+        if codec.NAME in remoteCodecs:
+            return codec
+    return JsonCodec
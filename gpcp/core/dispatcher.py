@@ -1,17 +1,174 @@
 from socket import timeout as socket_timeout
-from threading import Thread
+from concurrent.futures import Future
+from threading import Thread, Lock
+from collections import deque
+from typing import Callable, Tuple
 from queue import Queue
 import logging
 from gpcp.core import packet
+from gpcp.core.stream import RemoteIterator, StreamWindow
+from gpcp.utils.errors import RemoteError
 
 logger = logging.getLogger(__name__)
 
+class PendingRequests:
+    """
+    keeps the futures of the requests waiting for a response: if request ids were
+    negotiated responses are matched by id, otherwise by arrival order. Also keeps
+    the streams being received, and the windows of the streams being sent, which
+    are only available with request ids.
+    """
+
+    def __init__(self, requestIds: bool):
+        self.requestIds = requestIds
+        self._lock = Lock()
+        self._lastId = 0
+        self._futures = {}
+        self._streams = {} # requestId -> RemoteIterator
+        self._windows = {} # requestId -> StreamWindow
+        self._order = deque() # ids in sending order, used without request ids
+        self._closed = False
+
+    def add(self, decode: Callable) -> Tuple[int, Future]:
+        """
+        registers a new request. Without request ids this must be called in the
+        same order as requests are sent.
+
+        :param decode: called with the response payload to obtain the result of the future
+        :returns: (requestId, future)
+        """
+        future = Future()
+        with self._lock:
+            requestId = self._nextId()
+            self._futures[requestId] = (future, decode)
+            if not self.requestIds:
+                self._order.append(requestId)
+        return (requestId, future)
+
+    def addStream(self, decode: Callable, window: int, sendCredit: Callable) -> Tuple[int, RemoteIterator]:
+        """
+        registers a new request whose response is streamed, see `gpcp.core.stream.RemoteIterator`
+
+        :returns: (requestId, iterator)
+        """
+        with self._lock:
+            requestId = self._nextId()
+            iterator = RemoteIterator(self, requestId, decode, window, sendCredit)
+            self._streams[requestId] = iterator
+        return (requestId, iterator)
+
+    def _nextId(self) -> int:
+        if self._closed:
+            raise ConnectionError("Did not get a response")
+        self._lastId = self._lastId % 0xffffffff + 1 # 0 is never used
+        return self._lastId
+
+    def openWindow(self, requestId: int, credits: int) -> StreamWindow:
+        """
+        registers a stream being sent in response to the request `requestId`
+
+        :param credits: the credits initially granted by the requesting endpoint
+        """
+        window = StreamWindow(credits)
+        with self._lock:
+            if self._closed:
+                window.cancel()
+            else:
+                self._windows[requestId] = window
+        return window
+
+    def closeWindow(self, requestId: int):
+        with self._lock:
+            self._windows.pop(requestId, None)
+
+    def discard(self, requestId: int):
+        """
+        forgets about a request, e.g. because it could not be sent
+        """
+        with self._lock:
+            self._futures.pop(requestId, None)
+            self._streams.pop(requestId, None)
+            if not self.requestIds and requestId in self._order:
+                self._order.remove(requestId)
+
+    def onResponse(self, data: memoryview):
+        """
+        resolves the future of the request the response frame `data` belongs to,
+        or passes it to the stream it belongs to
+        """
+        with self._lock:
+            if self.requestIds:
+                kind, requestId, payload = packet.Envelope.decode(data)
+            else:
+                kind, payload = packet.Envelope.RESPONSE, data
+                requestId = self._order.popleft() if self._order else None
+
+            if kind == packet.Envelope.CREDIT:
+                window = self._windows.get(requestId)
+                stream, future = None, None
+            elif kind in (packet.Envelope.CHUNK, packet.Envelope.END) or requestId in self._streams:
+                stream = self._streams.get(requestId)
+                if kind != packet.Envelope.CHUNK:
+                    self._streams.pop(requestId, None)
+                window, future = None, None
+            else:
+                future, decode = self._futures.pop(requestId, (None, None))
+                window, stream = None, None
+
+        if window is not None:
+            window.add(packet.Credit.decode(payload))
+        elif stream is not None:
+            if kind == packet.Envelope.CHUNK:
+                stream.onChunk(payload)
+            elif kind == packet.Envelope.END:
+                stream.onEnd()
+            elif kind == packet.Envelope.ERROR:
+                stream.onError(RemoteError(*packet.ErrorData.decode(payload)))
+            else:
+                stream.onError(ValueError(f"unexpected frame kind {kind} for stream {requestId}"))
+        elif future is None:
+            if kind == packet.Envelope.RESPONSE:
+                logger.warning(f"received response for unknown request {requestId}: {bytes(data)}")
+            else: # e.g. for streams closed early, or credits for streams already completed
+                logger.debug(f"received frame of kind {kind} for unknown request {requestId}")
+        elif kind == packet.Envelope.ERROR:
+            future.set_exception(RemoteError(*packet.ErrorData.decode(payload)))
+        else:
+            try:
+                future.set_result(decode(payload))
+            except Exception as e:
+                future.set_exception(e)
+
+        # the response was decoded into new objects, so the frame buffer can be reused
+        packet.bufferPool.release(data)
+
+    def close(self):
+        """
+        fails all pending requests, and all requests added from now on
+        """
+        with self._lock:
+            self._closed = True
+            futures = list(self._futures.values())
+            streams = list(self._streams.values())
+            windows = list(self._windows.values())
+            self._futures.clear()
+            self._streams.clear()
+            self._windows.clear()
+            self._order.clear()
+
+        for future, _ in futures:
+            future.set_exception(ConnectionError("Did not get a response"))
+        for stream in streams:
+            stream.onError(ConnectionError("Did not get the whole response stream"))
+        for window in windows:
+            window.cancel()
+
 class Dispatcher:
 
-    def __init__(self, socket, timeout: float = 0.1):
+    def __init__(self, socket, requestIds: bool = False, timeout: float = 0.1):
         #initialize the event triggers
         self.request = Queue()
-        self.response = Queue()
+        self.pending = PendingRequests(requestIds)
         self.socket = socket
         self.socket.settimeout(timeout)
         self._stop = False
@@ -41,10 +198,10 @@ class Dispatcher:
                     self.request.put(data)
                 else:
                     logger.debug(f"received response: {data}")
-                    self.response.put(data)
+                    self.pending.onResponse(data)
 
     def stopReceiver(self):
-        # sending None to request and response makes sure the endpoint closes, too
+        # sending None to request and failing pending requests makes sure the endpoint closes, too
         self.request.put(None)
-        self.response.put(None)
+        self.pending.close()
         self._stop = True
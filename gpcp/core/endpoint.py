@@ -1,29 +1,67 @@
-from threading import Event, Thread
+from concurrent.futures import Future
+from threading import Event, Thread, RLock, current_thread
 from typing import Union
 import logging
 import json
 from gpcp.utils.base_types import getFromId
 from gpcp.utils.errors import ConfigurationError
 from gpcp.core.dispatcher import Dispatcher
-from gpcp.core import packet
+from gpcp.core.reactor import ReactorDispatcher
+from gpcp.core.scheduler import RequestScheduler
+from gpcp.core.stream import ResponseStream, RemoteIterator
+from gpcp.core import packet, codec
 
 logger = logging.getLogger(__name__)
 
+def checkRemoteConfig(localRole: str, remoteConfig: dict, localAddress, remoteAddress) -> bool:
+    """
+    checks the configuration received from the remote endpoint during the initial data transfer
+
+    :param localRole: the role of the local endpoint, already validated
+    :param remoteConfig: the configuration sent by the remote endpoint
+    :param localAddress: the local address of the connection, used for logging
+    :param remoteAddress: the remote address of the connection, used for logging
+    :returns: whether the two endpoints can talk to each other
+    """
+
+    # checking config validity
+    if remoteConfig["role"] not in ["R", "A", "AR", "RA"]:
+        logger.error(f"invalid configuration argument '{remoteConfig['role']}' for 'role' in connection {remoteAddress}, closing")
+        return False
+
+    # checking if the endpoints can actually talk to each other
+    if remoteConfig["role"] == "R" and localRole == "R":
+        logger.warning(f"both local {localAddress} and remote {remoteAddress} endpoints can only respond, closing")
+        return False
+    elif remoteConfig["role"] == "A" and localRole == "A":
+        logger.warning(f"both local {localAddress} and remote {remoteAddress} endpoints can only request, closing")
+        return False
+
+    return True
+
 class EndPoint():
 
-    def __init__(self, server, socket, validatedRole: str, handlerInstance):
+    def __init__(self, server, socket, validatedRole: str, handlerInstance, reactor = None,
+                 executor = None, concurrency: int = 1):
         """
-        initializes this endpoint, starts its main loop on another thread and
-        then notifies the handler with onConnected()
+        initializes this endpoint, starts its main loop on another thread (or
+        registers it to the reactor) and then notifies the handler with onConnected()
 
         :param server: the server this endpoint belongs to, can be None if this
                        endpoint belongs to a client
         :param socket: the socket for the connection
         :param validatedRole:str: the role of this endpoint, already validated
         :param handlerInstance: the handler instance
+        :param reactor: the `gpcp.core.reactor.Reactor` which reads frames for this
+                        endpoint, None to use a dedicated dispatcher thread instead
+        :param executor: the `concurrent.futures.Executor` running requests, None to run them
+                         on the main loop thread one at a time. Required if `reactor` is used.
+        :param concurrency: the maximum number of requests running at once on `executor`
         """
         self._stop = False
         self._finishedInitializing = False
+        self.mainLoopThread = None
+        self.scheduler = None
         self._isServer = server is not None
         self.socket = socket
         self.localAddress = self.socket.getsockname()
@@ -33,30 +71,27 @@ class EndPoint():
 
         # setting up initial data to send
         config = json.dumps({
-            "role": self.role
+            "role": self.role,
+            "requestIds": True,
+            "codecs": codec.supportedCodecs(),
         })
 
         # initial data transfer
         packet.sendAll(self.socket, config)
         logger.debug(f"remote config sent to {self.remoteAddress}: {config}")
-        remoteConfig = json.loads(packet.receiveAll(self.socket)[0])
+        remoteConfig = json.loads(str(packet.receiveAll(self.socket)[0], packet.ENCODING))
         logger.debug(f"remote config recieved on {self.localAddress}: {remoteConfig}")
 
-        # checking config validity
-        if remoteConfig["role"] not in ["R", "A", "AR", "RA"]:
-            logger.error(f"invalid configuration argument '{remoteConfig['role']}' for 'role' in connection {self.remoteAddress}, closing")
+        if not checkRemoteConfig(self.role, remoteConfig, self.localAddress, self.remoteAddress):
+            self._stop = True
             self.socket.close()
             return
 
-        # checking if the endpoints can actually talk to each other
-        if remoteConfig["role"] == "R" and self.role == "R":
-            logger.warning(f"both local {self.localAddress} and remote {self.remoteAddress} endpoints can only respond, closing")
-            self.socket.close()
-            return
-        elif remoteConfig["role"] == "A" and self.role == "A":
-            logger.warning(f"both local {self.localAddress} and remote {self.remoteAddress} endpoints can only request, closing")
-            self.socket.close()
-            return
+        # frames are tagged with request ids only if the remote endpoint supports them
+        self.requestIds = remoteConfig.get("requestIds", False) is True
+        self.codec = codec.negotiate(remoteConfig)
+        logger.debug(f"using codec {self.codec.NAME} with {self.remoteAddress}")
+        self._sendLock = RLock()
 
         # locking the handler if needed
         if self.handler is not None:
@@ -65,15 +100,22 @@ class EndPoint():
             else:
                 self.handler._LOCK = False
 
-        self.startMainLoopThread()
-        while not self._finishedInitializing:
-            pass # wait for the main loop thread to start
+        if executor is not None:
+            self.scheduler = RequestScheduler(self, executor, concurrency)
+
+        if reactor is None:
+            self.startMainLoopThread()
+            while not self._finishedInitializing:
+                pass # wait for the main loop thread to start
+        else:
+            self.dispatcher = ReactorDispatcher(reactor, self)
+            reactor.register(self)
         if self.handler is not None:
             self.handler.onConnected(server, self, self.remoteAddress)
 
     def mainLoop(self):
         #dispatcher thread setup
-        self.dispatcher = Dispatcher(self.socket)
+        self.dispatcher = Dispatcher(self.socket, self.requestIds)
         self._finishedInitializing = True
 
         while not self._stop:
@@ -85,18 +127,136 @@ class EndPoint():
                 self._closeConnection(True)
                 break
 
-            else: # send the handler response to the client
-                logger.debug(f"received data from {self.remoteAddress}")
-                response = self.handler.handleData(data)
-                if response == "ENDPOINT NOT STARTED TO THIS SCOPE":
-                    logger.warning(f"unexpected request with data={data} while handler locked from {self.remoteAddress}")
+            elif self.scheduler is not None:
+                self.scheduler.submit(data)
+
+            elif not self._handleRequest(data):
+                break
+
+    def _handleRequest(self, data: bytes) -> bool:
+        """
+        sends the handler response for a request to the other end point
+
+        :param data: the request data
+        :returns: False if the connection was closed because of an error
+        """
+
+        result = self._processRequest(data)
+        if result is None:
+            return False
+        return self._sendResponse(*result)
+
+    def _processRequest(self, data: bytes):
+        """
+        obtains the handler response for a request
+
+        :param data: the request data
+        :returns: (response, kind, requestId), or None if the connection was closed because of an error
+        """
 
+        logger.debug(f"received data from {self.remoteAddress}")
+        frame = data
+        requestId = 0
+        streamCredits = None # None if the remote endpoint does not accept a streamed response
+        if self.requestIds:
+            requestKind, requestId, data = packet.Envelope.decode(data)
+            if requestKind == packet.Envelope.STREAM_REQUEST:
+                streamCredits = packet.Credit.decode(data)
+                data = data[packet.Credit.LENGTH:]
+
+        try:
+            response = self.handler.handleData(data, self.codec)
+            if isinstance(response, ResponseStream):
+                if streamCredits is None:
+                    response = response.collect()
+                else:
+                    response.initialCredits = streamCredits
+            kind = packet.Envelope.RESPONSE
+        except Exception as e:
+            logger.error(f"{e!r} encountered while handling request from {self.remoteAddress}", exc_info=True)
+            if not self.requestIds:
+                # there is no way to report the error, so the request would never get a response
+                self._closeConnection(current_thread() is self.mainLoopThread)
+                return None
+            response = packet.ErrorData.encode(e.__class__.__name__, str(e))
+            kind = packet.Envelope.ERROR
+
+        if self.handler is not None and self.handler._LOCK is True:
+            logger.warning(f"unexpected request with data={bytes(data)} while handler locked from {self.remoteAddress}")
+
+        # the request was decoded into new objects, so the frame buffer can be reused
+        packet.bufferPool.release(frame)
+
+        return (response, kind, requestId)
+
+    def _sendResponse(self, response: Union[bytes, str, list, ResponseStream], kind: int, requestId: int) -> bool:
+        """
+        :returns: False if the connection was closed because of an error
+        """
+        if isinstance(response, ResponseStream):
+            return self._sendStream(response, requestId)
+
+        try:
+            with self._sendLock:
+                self._sendFrame(response, kind=kind, requestId=requestId)
+        except (ConnectionError, OSError) as e:
+            logger.error(f"{e} encountered while sending data to {self.remoteAddress}, closing connection")
+            self._closeConnection(current_thread() is self.mainLoopThread)
+            return False
+        return True
+
+    def _sendStream(self, stream: ResponseStream, requestId: int) -> bool:
+        """
+        sends the chunks of a streamed response as long as the remote endpoint grants credits,
+        then an end frame, or an error frame if the iterator raised an exception
+
+        :returns: False if the connection was closed because of an error
+        """
+        window = self.dispatcher.pending.openWindow(requestId, stream.initialCredits)
+        chunks = stream.chunks()
+        try:
+            while True:
                 try:
-                    packet.sendAll(self.socket, response)
-                except (ConnectionError, OSError) as e:
-                    logger.error(f"{e} encountered while sending data to {self.remoteAddress}, closing connection")
-                    self._closeConnection(True)
-                    break
+                    chunk = next(chunks)
+                    kind = packet.Envelope.CHUNK
+                except StopIteration:
+                    chunk, kind = b"", packet.Envelope.END
+                except Exception as e:
+                    logger.error(f"{e!r} encountered while streaming response to {self.remoteAddress}", exc_info=True)
+                    chunk, kind = packet.ErrorData.encode(e.__class__.__name__, str(e)), packet.Envelope.ERROR
+
+                if kind == packet.Envelope.CHUNK and not window.take():
+                    logger.debug(f"stream {requestId} cancelled by {self.remoteAddress}")
+                    return True
+                if not self._sendResponse(chunk, kind, requestId):
+                    return False
+                if kind != packet.Envelope.CHUNK:
+                    return True
+        finally:
+            self.dispatcher.pending.closeWindow(requestId)
+            chunks.close()
+            stream.close()
+
+    def _sendCredit(self, requestId: int, credits: int):
+        with self._sendLock:
+            self._sendFrame(packet.Credit.encode(credits), kind=packet.Envelope.CREDIT, requestId=requestId)
+
+    def _sendFrame(self, data: Union[bytes, str, list], isRequest: bool = False,
+                   kind: int = packet.Envelope.RESPONSE, requestId: int = 0):
+        """
+        sends a frame, prefixed with the envelope if request ids were negotiated.
+        Must be called with `self._sendLock` held or else frames sent from
+        different threads could be interleaved.
+
+        :param data: the payload, or a list of segments as returned by the codecs
+        """
+        if isinstance(data, str):
+            data = data.encode(packet.ENCODING)
+        buffers = data if isinstance(data, list) else [data]
+        if self.requestIds:
+            # the envelope and the data are sent together without concatenating them
+            buffers = [packet.Envelope.encode(kind, requestId)] + buffers
+        packet.sendBuffers(self.socket, buffers, isRequest)
 
     def startMainLoopThread(self):
         self.mainLoopThread = Thread(target=self.mainLoop, daemon=True)
@@ -119,13 +279,16 @@ class EndPoint():
             # set stop flags for threads: dispatcher.setStopFlag() also sets events for request/response buffers
             self._stop = True
             self.dispatcher.stopReceiver()
+            if self.scheduler is not None:
+                self.scheduler.stop()
 
-            if not calledFromMainLoopThread:
-                # first join our thread, which should be instant since events for request/response buffers were set
-                self.mainLoopThread.join()
-            if self._finishedInitializing:
-                # then join the dispatcher (could take up to the timeout passed at the beginning)
-                self.dispatcher.thread.join()
+            if self.mainLoopThread is not None:
+                if not calledFromMainLoopThread:
+                    # first join our thread, which should be instant since events for request/response buffers were set
+                    self.mainLoopThread.join()
+                if self._finishedInitializing:
+                    # then join the dispatcher (could take up to the timeout passed at the beginning)
+                    self.dispatcher.thread.join()
 
             # close the socket
             if not self.socket._closed:
@@ -135,6 +298,8 @@ class EndPoint():
         self._closeConnection(False)
 
     def isStopped(self):
+        if self.mainLoopThread is None: # registered to a reactor, or never started
+            return self._stop
         return self.socket._closed and not self.mainLoopThread.is_alive()
 
     def loadInterface(self, namespace: type, rawInterface: list = None):
@@ -146,8 +311,10 @@ class EndPoint():
         this is the definition of a remote command:
         {
             name: str,
+            id: int, (optional) used instead of the name if the codec supports it
             arguments: [{name: str, type: type}, ...],
             return_type: type,
+            stream: bool, (optional) whether the command returns an iterator over items of return_type
             doc: str
         }
 
@@ -177,7 +344,12 @@ class EndPoint():
                     arguments = []
                     for i, arg in enumerate(args):
                         arguments.append(wrapper.argumentTypes[i].serialize(arg))
-                    returnedData = self.commandRequest(wrapper.commandIdentifier, arguments)
+                    command = wrapper.commandIdentifier
+                    if self.codec.usesCommandIds and wrapper.commandId is not None:
+                        command = wrapper.commandId
+                    if wrapper.stream:
+                        return _deserializeItems(self.commandRequestStream(command, arguments), wrapper.returnType)
+                    returnedData = self.commandRequest(command, arguments)
                     return wrapper.returnType.deserialize(returnedData)
                 return wrapper
 
@@ -185,6 +357,8 @@ class EndPoint():
 
             #setting up handler method data
             wrapper.commandIdentifier = command["name"]
+            wrapper.commandId = command.get("id")
+            wrapper.stream = command.get("stream", False)
             wrapper.argumentTypes = [getFromId(arg["type"]) for arg in command["arguments"]]
             wrapper.returnType = getFromId(command["return_type"])
             wrapper.__doc__ = command["description"]
@@ -194,30 +368,88 @@ class EndPoint():
             #assigning the method to the namespace class
             setattr(namespace, command["name"], wrapper)
 
-    def commandRequest(self, commandIdentifier: str, arguments: list):
+    def commandRequest(self, commandIdentifier: Union[str, int], arguments: list):
         """
         Format a command request with given arguments, send it and return the response.
-        The response is returned after being read from JSON into a Python object using
-        `json.loads`. Remember to further deserialize the response using one of the
+        The response is returned after being decoded into a Python object using the
+        negotiated codec (see `gpcp.core.codec`). Remember to further deserialize the response using one of the
         types in `gpcp.utils.base_types` or one extending them, otherwise the response
         will not make sense since it was serialized on the server's end.
 
         :param arguments: list of all arguments to send to the server
-        :param commandIdentifier: the name of the command to call
+        :param commandIdentifier: the name of the command to call, or its id in the
+            `requestCommands` table if `self.codec.usesCommandIds`
         """
 
         logger.debug(f"commandRequest() called with commandIdentifier={commandIdentifier}, arguments={arguments}")
 
+        # wait for the dispatcher to resolve the future with the response
+        result = self.commandRequestAsync(commandIdentifier, arguments).result()
+        logger.debug(f"commandRequest() received result={result}")
+        return result
+
+    def commandRequestAsync(self, commandIdentifier: Union[str, int], arguments: list) -> Future:
+        """
+        Same as `commandRequest()`, but returns immediately a `concurrent.futures.Future`
+        which will hold the result. Many threads can make requests on the same endpoint
+        at the same time: if the remote endpoint supports request ids responses are
+        matched to their request even if they arrive out of order.
+
+        :param arguments: list of all arguments to send to the server
+        :param commandIdentifier: the name of the command to call, or its id in the
+            `requestCommands` table if `self.codec.usesCommandIds`
+        """
+
+        logger.debug(f"commandRequestAsync() called with commandIdentifier={commandIdentifier}, arguments={arguments}")
+
         # format the command into a valid request
-        data = packet.CommandData.encode(commandIdentifier, arguments)
-        # send the request
-        packet.sendAll(self.socket, data, isRequest=True)
-        # wait for a response to be enqueued to the response queue
-        response = self.dispatcher.response.get()
+        data = self.codec.encodeRequest(commandIdentifier, arguments)
+        with self._sendLock:
+            # without request ids responses are matched in sending order, so
+            # the request is registered and sent while holding the lock
+            requestId, future = self.dispatcher.pending.add(self.codec.decodeValue)
+            try:
+                self._sendFrame(data, isRequest=True, kind=packet.Envelope.REQUEST, requestId=requestId)
+            except (ConnectionError, OSError):
+                self.dispatcher.pending.discard(requestId)
+                raise
+        return future
+
+    def commandRequestStream(self, commandIdentifier: Union[str, int], arguments: list,
+                             window: int = 4) -> RemoteIterator:
+        """
+        Same as `commandRequest()`, but for commands returning an iterator: returns
+        immediately a `gpcp.core.stream.RemoteIterator` over the items, each one to be
+        deserialized like the responses of `commandRequest()`. Items are received in
+        chunks while iterating, and the iterator should be closed with `close()` if it
+        is not consumed until the end. Without request ids all items are received at once.
 
-        if response is None:
-            raise ConnectionError("Did not get a response")
+        :param arguments: list of all arguments to send to the server
+        :param commandIdentifier: the name of the command to call, or its id in the
+            `requestCommands` table if `self.codec.usesCommandIds`
+        :param window: the maximum number of chunks received ahead of the ones being iterated over
+        """
 
-        result = json.loads(response.decode(packet.ENCODING))
-        logger.debug(f"commandRequest() received result={result}")
-        return result
+        logger.debug(f"commandRequestStream() called with commandIdentifier={commandIdentifier}, arguments={arguments}")
+
+        if not self.requestIds:
+            return iter(self.commandRequest(commandIdentifier, arguments))
+
+        data = self.codec.encodeRequest(commandIdentifier, arguments)
+        buffers = [packet.Credit.encode(window)] + (data if isinstance(data, list) else [data])
+        with self._sendLock:
+            requestId, iterator = self.dispatcher.pending.addStream(self.codec.decodeValue, window, self._sendCredit)
+            try:
+                self._sendFrame(buffers, isRequest=True, kind=packet.Envelope.STREAM_REQUEST, requestId=requestId)
+            except (ConnectionError, OSError):
+                self.dispatcher.pending.discard(requestId)
+                raise
+        return iterator
+
+def _deserializeItems(iterator, itemType: type):
+    try:
+        for item in iterator:
+            yield itemType.deserialize(item)
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
@@ -1,9 +1,10 @@
 """packet module containing functions to handle packets"""
 from typing import Union, Tuple
-from threading import current_thread
+from threading import current_thread, Lock
 import logging
 import json
 import socket
+import struct
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +12,15 @@ HEADER_LENGTH = 4
 HEADER_BYTEORDER = "big"
 ENCODING = "utf-8"
 
+def jsonDefault(value):
+    """
+    used as `default` for `json.dumps()`: bytes, which json can't represent,
+    are sent as ascii text to peers speaking the json codec
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("ascii")
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
 class CommandData:
 
     @staticmethod
@@ -21,7 +31,7 @@ class CommandData:
         :param commandIdentifier: the command name
         :param arguments: list of all arguments
         """
-        return (commandIdentifier + json.dumps(arguments)).encode(ENCODING)
+        return (commandIdentifier + json.dumps(arguments, default=jsonDefault)).encode(ENCODING)
 
     @staticmethod
     def decode(data: Union[bytes, str]) -> Tuple[str, list]:
@@ -30,35 +40,163 @@ class CommandData:
 
         :param data: the formatted data
         """
-        if isinstance(data, bytes):
-            data = data.decode(ENCODING)
+        if not isinstance(data, str):
+            data = str(data, ENCODING)
         separatorIndex = data.find("[")
         commandIdentifier = data[:separatorIndex]
         arguments = json.loads(data[separatorIndex:])
         logger.debug(f"decoded command from '{data}' -> args: '{arguments}'; cmd: '{commandIdentifier}'")
         return (commandIdentifier, arguments)
 
+class ErrorData:
+
+    @staticmethod
+    def encode(errorType: str, message: str) -> bytes:
+        """
+        formats the payload of an error response
+
+        :param errorType: the kind of error, e.g. the name of the exception raised by the handler
+        :param message: a description of the error
+        """
+        return json.dumps({"type": errorType, "message": message}).encode(ENCODING)
+
+    @staticmethod
+    def decode(data: Union[bytes, str]) -> Tuple[str, str]:
+        """
+        from the payload of an error response return (errorType, message)
+
+        :param data: the formatted data
+        """
+        if not isinstance(data, str):
+            data = str(data, ENCODING)
+        error = json.loads(data)
+        return (error["type"], error["message"])
+
+class Envelope:
+    """
+    prefix of the payload of every frame when request ids are negotiated in the
+    initial config: the frame kind (1 byte) and the request id (4 bytes), which
+    allows matching responses to requests regardless of their order
+    """
+
+    LENGTH = 5
+
+    # frame kinds
+    REQUEST = 0
+    RESPONSE = 1
+    ERROR = 2
+    STREAM_REQUEST = 3 # a request accepting a streamed response, the payload starts with a `Credit`
+    CHUNK = 4 # a chunk of a streamed response
+    END = 5 # the end of a streamed response
+    CREDIT = 6 # credits granted to the endpoint sending a streamed response, the payload is a `Credit`
+
+    _STRUCT = struct.Struct(">BI")
+
+    @staticmethod
+    def encode(kind: int, requestId: int) -> bytes:
+        return Envelope._STRUCT.pack(kind, requestId)
+
+    @staticmethod
+    def decode(data: Union[bytes, memoryview]) -> Tuple[int, int, Union[bytes, memoryview]]:
+        """
+        :returns: (kind, requestId, payload), payload is a view without copies if data is a memoryview
+        """
+        kind, requestId = Envelope._STRUCT.unpack_from(data)
+        return (kind, requestId, data[Envelope.LENGTH:])
+
+class Credit:
+    """
+    the number of chunks of a streamed response the requesting endpoint is ready to receive (4 bytes),
+    0 means that the stream was cancelled
+    """
+
+    LENGTH = 4
+
+    _STRUCT = struct.Struct(">I")
+
+    @staticmethod
+    def encode(credits: int) -> bytes:
+        return Credit._STRUCT.pack(credits)
+
+    @staticmethod
+    def decode(data) -> int:
+        return Credit._STRUCT.unpack_from(data)[0]
+
 class Header:
 
+    _STRUCT = struct.Struct(">I")
+
     @staticmethod
     def encode(length: int, isRequest: bool) -> bytes:
         if length > 0x7fffffff: #0x7fffffff == 01111111 11111111 11111111 11111111
             raise ValueError("length too big to handle")
 
-        byteList = [isRequest << 7 + ((length >> 24) & 0x7f), (length >> 16) & 0xff, (length >> 8) & 0xff, (length) & 0xff]
-        logger.debug(f"header encoded from length {length}, isRequest {isRequest} to: {bytes(byteList)}")
-        return byteList
+        head = Header._STRUCT.pack(length | (isRequest << 31))
+        logger.debug(f"header encoded from length {length}, isRequest {isRequest} to: {head}")
+        return head
 
     @staticmethod
-    def decode(head) -> int:
-        isRequest = bool(head[0] & 0x80)
+    def decode(head) -> Tuple[int, bool]:
+        value = Header._STRUCT.unpack_from(head)[0]
+        isRequest = bool(value & 0x80000000)
+
+        logger.debug(f"header decoded from head {bytes(head[:HEADER_LENGTH])} to: isRequest {isRequest}; length {value & 0x7fffffff}")
+        return (value & 0x7fffffff, isRequest)
+
+class BufferPool:
+    """
+    keeps the buffers frames are received into, so that they can be reused instead of
+    being allocated for every frame. Buffers are grouped in power-of-two size classes.
+    Releasing a buffer is optional: buffers never released are just garbage collected.
+    """
+
+    MIN_BUFFER_SIZE = 256
+
+    def __init__(self, maxBufferSize: int = 1 << 20, maxBuffersPerSize: int = 16):
+        """
+        :param maxBufferSize: buffers bigger than this are allocated for every frame
+        :param maxBuffersPerSize: the maximum number of buffers kept for every size class
+        """
+        self.maxBufferSize = maxBufferSize
+        self.maxBuffersPerSize = maxBuffersPerSize
+        self._lock = Lock()
+        self._buffers = {} # size -> list of free buffers
+
+    def acquire(self, size: int) -> memoryview:
+        """
+        :returns: a writable memoryview of exactly `size` bytes
+        """
+        if size > self.maxBufferSize:
+            return memoryview(bytearray(size))
+
+        bufferSize = max(self.MIN_BUFFER_SIZE, 1 << (size - 1).bit_length())
+        with self._lock:
+            freeBuffers = self._buffers.get(bufferSize)
+            buffer = freeBuffers.pop() if freeBuffers else None
+        if buffer is None:
+            buffer = bytearray(bufferSize)
+        return memoryview(buffer)[:size]
+
+    def release(self, view: memoryview):
+        """
+        gives back the buffer of a view returned by `acquire()`. The view, and all
+        the views and slices obtained from it, must not be used anymore.
+        """
+        if not isinstance(view, memoryview) or not isinstance(view.obj, bytearray):
+            return
+        buffer = view.obj
+        view.release()
 
-        byteList = [head[0] & 0x7f]
-        for i in range(1, HEADER_LENGTH):
-            byteList.append(head[i] & 0xff)
+        bufferSize = len(buffer)
+        if bufferSize > self.maxBufferSize or bufferSize & (bufferSize - 1) != 0:
+            return # not allocated by the pool
+        with self._lock:
+            freeBuffers = self._buffers.setdefault(bufferSize, [])
+            if len(freeBuffers) < self.maxBuffersPerSize:
+                freeBuffers.append(buffer)
 
-        logger.debug(f"header decoded from head {head} to: isRequest {isRequest}; bytes {byteList}")
-        return (int.from_bytes(bytes(byteList), HEADER_BYTEORDER), isRequest)
+# the pool frames are received into, shared by all connections
+bufferPool = BufferPool()
 
 def sendAll(connection, data: Union[bytes, str], isRequest: bool = False):
     """
@@ -70,34 +208,78 @@ def sendAll(connection, data: Union[bytes, str], isRequest: bool = False):
 
     if isinstance(data, str):
         data = data.encode(ENCODING)
+    sendBuffers(connection, [data], isRequest)
 
-    data = bytes(Header.encode(len(data), isRequest)) + data
-    while data:
-        logger.debug(f"sending data fragment {data} to {current_thread().name}")
-        sent = connection.send(data)
-        data = data[sent:]
+def sendBuffers(connection, buffers: list, isRequest: bool = False):
+    """
+    sends a single frame made of the concatenation of `buffers`, without copying them,
+    using scatter-gather I/O (`socket.sendmsg`) where available
 
-def receiveAll(connection) -> Union[str, None]:
+    :param connection: the socket where to send the data
+    :param buffers: a list of bytes-like objects
     """
-    recieves all data from a connection
+
+    length = sum(len(buffer) for buffer in buffers)
+    buffers = [memoryview(Header.encode(length, isRequest))] + [memoryview(buffer).cast("B") for buffer in buffers]
+    logger.debug(f"sending frame of {length} bytes to {current_thread().name}")
+
+    if not hasattr(connection, "sendmsg"): # e.g. on Windows
+        for buffer in buffers:
+            connection.sendall(buffer)
+        return
+
+    while buffers:
+        sent = connection.sendmsg(buffers)
+        # drop what was sent, slicing memoryviews does not copy
+        while sent > 0:
+            if sent >= len(buffers[0]):
+                sent -= len(buffers.pop(0))
+            else:
+                buffers[0] = buffers[0][sent:]
+                sent = 0
+        while buffers and len(buffers[0]) == 0:
+            buffers.pop(0)
+
+def receiveAll(connection) -> Tuple[Union[memoryview, None], Union[bool, None]]:
+    """
+    recieves all data of a single frame from a connection, directly into a buffer
+    of `bufferPool`, which can be released once the frame has been handled
 
     :param connection: the socket where recieve data
+    :returns: (data, isRequest), or (None, None) if the connection was closed
+    :raises TimeoutError: if no frame started arriving before the socket timeout
     """
 
+    head = bytearray(HEADER_LENGTH)
     try:
-        head = connection.recv(HEADER_LENGTH) #read the header from a buffered request
+        received = connection.recv_into(head) #read the header from a buffered request
+    except socket.timeout:
+        raise TimeoutError()
+    if received == 0 or not _receiveInto(connection, memoryview(head)[received:]):
+        return (None, None)
 
-        if head:
-            byteCount, isRequest = Header.decode(head)
-            data = connection.recv(byteCount) #read the actual message of len head
-            logger.debug(f"receiving data fragment {data} from {current_thread().name}")
+    byteCount, isRequest = Header.decode(head)
+    data = bufferPool.acquire(byteCount) #read the actual message of len head
+    if not _receiveInto(connection, data):
+        bufferPool.release(data)
+        return (None, None)
 
-            while len(data) < byteCount:
-                fragment = connection.recv(byteCount - len(data))
-                logger.debug(f"receiving data fragment {fragment} from {current_thread().name}")
-                data += fragment
+    logger.debug(f"received frame of {byteCount} bytes from {current_thread().name}")
+    return (data, isRequest)
 
-            return (data, isRequest)
-        return (None, None)
-    except socket.timeout:
-        raise TimeoutError()
+def _receiveInto(connection, view: memoryview) -> bool:
+    """
+    fills `view` with data from the connection. Socket timeouts are ignored,
+    since the frame being received has already started arriving.
+
+    :returns: False if the connection was closed
+    """
+    while view:
+        try:
+            received = connection.recv_into(view)
+        except socket.timeout:
+            continue
+        if received == 0:
+            return False
+        view = view[received:]
+    return True
@@ -0,0 +1,77 @@
+"""
+process pool running the commands marked with `@command(executor="process")`,
+shared by all the handlers in this process
+"""
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Callable
+import pickle
+import logging
+
+logger = logging.getLogger(__name__)
+
+_lock = Lock()
+_pool = None
+_maxWorkers = None
+_users = 0
+
+def configure(maxWorkers: int = None):
+    """
+    sets the number of worker processes of the pool created from now on
+
+    :param maxWorkers: the number of processes, None to use the number of CPUs
+    """
+    global _maxWorkers
+    with _lock:
+        _maxWorkers = maxWorkers
+
+def acquire():
+    """
+    declares that the caller (e.g. a running server) uses the pool, which will be shut
+    down when all users released it. The pool itself is created lazily on first use.
+    """
+    global _users
+    with _lock:
+        _users += 1
+
+def release():
+    """
+    undoes `acquire()`, shutting down the pool if there are no users left
+    """
+    global _users, _pool
+    with _lock:
+        _users -= 1
+        if _users > 0 or _pool is None:
+            return
+        pool, _pool = _pool, None
+
+    logger.debug("shutting down the command process pool")
+    pool.shutdown(wait=True)
+
+def getPool() -> ProcessPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            logger.debug(f"starting the command process pool with maxWorkers={_maxWorkers}")
+            _pool = ProcessPoolExecutor(max_workers=_maxWorkers)
+        return _pool
+
+def assertPicklable(handlerClass: type, function: Callable):
+    """
+    raises `pickle.PicklingError` (or another exception raised by `pickle.dumps`)
+    if the command can't be shipped to the worker processes
+    """
+    pickle.dumps((handlerClass, function))
+
+def runCommand(handlerClass: type, function: Callable, arguments: list):
+    """
+    runs a command in the pool and waits for its return value
+
+    :param handlerClass: the handler class, instantiated in the worker process
+    :param function: the command function
+    :param arguments: the already deserialized arguments
+    """
+    return getPool().submit(_runInWorker, handlerClass, function, arguments).result()
+
+def _runInWorker(handlerClass: type, function: Callable, arguments: list):
+    return function(handlerClass(), *arguments)
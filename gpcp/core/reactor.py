@@ -0,0 +1,167 @@
+from threading import Thread, Event, current_thread
+from queue import Queue
+import selectors
+import socket
+import logging
+from gpcp.core.dispatcher import PendingRequests
+from gpcp.core import packet
+
+logger = logging.getLogger(__name__)
+
+class FrameReader:
+    """
+    rebuilds frames out of the chunks of data read from a socket, which
+    can contain partial frames or more than one frame at a time
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        :param data: the data just read from the socket
+        :returns: a list of (data, isRequest), one for every completed frame,
+                  where data is a memoryview of a buffer of `packet.bufferPool`
+        """
+
+        self.buffer += data
+        frames = []
+        frameStart = 0
+        with memoryview(self.buffer) as view:
+            while len(view) - frameStart >= packet.HEADER_LENGTH:
+                byteCount, isRequest = packet.Header.decode(view[frameStart:])
+                frameEnd = frameStart + packet.HEADER_LENGTH + byteCount
+                if len(view) < frameEnd:
+                    break # the frame is not complete yet
+
+                frame = packet.bufferPool.acquire(byteCount)
+                frame[:] = view[frameStart + packet.HEADER_LENGTH:frameEnd]
+                frames.append((frame, isRequest))
+                frameStart = frameEnd
+
+        # removing all completed frames at once, instead of one at a time
+        del self.buffer[:frameStart]
+        return frames
+
+class ReactorDispatcher:
+    """
+    takes the place of `gpcp.core.dispatcher.Dispatcher` for endpoints registered
+    to a `Reactor`: frames are read by the reactor thread, and requests are passed
+    to the scheduler of the endpoint, which runs them on the server worker pool
+    """
+
+    def __init__(self, reactor, endpoint):
+        self.reactor = reactor
+        self.endpoint = endpoint
+        self.frameReader = FrameReader()
+        self.pending = PendingRequests(endpoint.requestIds)
+
+    def onFrame(self, data: bytes, isRequest: bool):
+        if isRequest:
+            logger.debug(f"received request: {data}")
+            self.endpoint.scheduler.submit(data)
+        else:
+            logger.debug(f"received response: {data}")
+            self.pending.onResponse(data)
+
+    def stopReceiver(self):
+        self.reactor.unregister(self.endpoint)
+        self.pending.close()
+
+class Reactor:
+    """
+    reads frames for all the registered endpoints on a single thread
+    using `selectors` (epoll on Linux)
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self._stop = False
+        self._operations = Queue()
+
+        # writing to this socket pair wakes up the reactor thread from select()
+        self._wakeupReader, self._wakeupWriter = socket.socketpair()
+        self._wakeupReader.setblocking(False)
+        self.selector.register(self._wakeupReader, selectors.EVENT_READ, None)
+
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.name = "gpcp reactor"
+        self.thread.start()
+
+    def run(self):
+        while not self._stop:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    self._runOperations()
+                else:
+                    self._read(key.fileobj, key.data)
+        self._runOperations()
+
+    def _runOperations(self):
+        try:
+            while self._wakeupReader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass # everything was read
+
+        while not self._operations.empty():
+            operation, done = self._operations.get()
+            operation()
+            done.set()
+
+    def _read(self, connection, endpoint):
+        try:
+            # the socket is readable, so recv() returns without blocking
+            data = connection.recv(65536)
+        except (ConnectionError, OSError) as e:
+            logger.error(f"{e} encountered while receiving data from {endpoint.remoteAddress}")
+            data = b""
+
+        if not data: # connection was closed
+            logger.debug(f"received None, closing connection {endpoint.remoteAddress}")
+            endpoint._closeConnection(True)
+            return
+
+        for frame, isRequest in endpoint.dispatcher.frameReader.feed(data):
+            endpoint.dispatcher.onFrame(frame, isRequest)
+
+    def _call(self, operation):
+        """
+        runs `operation` on the reactor thread and waits for it to complete,
+        since selectors can't be modified while another thread is selecting
+        """
+        if current_thread() is self.thread or not self.thread.is_alive():
+            operation()
+            return
+
+        done = Event()
+        self._operations.put((operation, done))
+        self._wakeupWriter.send(b"\0")
+        done.wait()
+
+    def register(self, endpoint):
+        """
+        starts reading frames for the endpoint, its dispatcher must be a `ReactorDispatcher`
+        """
+        self._call(lambda: self.selector.register(endpoint.socket, selectors.EVENT_READ, endpoint))
+
+    def unregister(self, endpoint):
+        def operation():
+            try:
+                self.selector.unregister(endpoint.socket)
+            except (KeyError, ValueError):
+                pass # already unregistered
+        self._call(operation)
+
+    def stop(self):
+        """
+        stops the reactor thread
+        """
+        def operation():
+            self._stop = True
+        self._call(operation)
+        self.thread.join()
+
+        self.selector.close()
+        self._wakeupReader.close()
+        self._wakeupWriter.close()
@@ -0,0 +1,91 @@
+from concurrent.futures import Executor
+from threading import Lock
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RequestScheduler:
+    """
+    runs the requests of an endpoint on a (usually server-wide) executor, with at most
+    `concurrency` requests of the same connection running at the same time.
+
+    Ordering guarantees: if request ids were negotiated responses are sent as soon as
+    they are ready, possibly out of order, since the other end point matches them by id.
+    Otherwise responses are held back and sent in the same order requests arrived.
+    """
+
+    def __init__(self, endpoint, executor: Executor, concurrency: int = 1):
+        """
+        :param endpoint: the endpoint whose requests are scheduled
+        :param executor: the executor running the requests
+        :param concurrency: the maximum number of requests of this endpoint running at once
+        """
+        self.endpoint = endpoint
+        self.executor = executor
+        self.concurrency = concurrency
+        self._lock = Lock()
+        self._requests = deque() # (sequence number, data) of requests waiting to run
+        self._running = 0
+        self._stop = False
+
+        # used to send responses in order when request ids are not available
+        self._nextSequence = 0
+        self._nextToSend = 0
+        self._ready = {}
+
+    def submit(self, data: bytes):
+        """
+        schedules a request received by the endpoint
+        """
+        with self._lock:
+            if self._stop:
+                return
+            self._requests.append((self._nextSequence, data))
+            self._nextSequence += 1
+            if self._running >= self.concurrency:
+                return # the request will be run when one of the running ones completes
+            self._running += 1
+        self.executor.submit(self._runNext)
+
+    def _runNext(self):
+        with self._lock:
+            if self._stop or not self._requests:
+                self._running -= 1
+                return
+            sequence, data = self._requests.popleft()
+
+        result = self.endpoint._processRequest(data)
+        if result is None: # the connection was closed
+            self.stop()
+        elif self.endpoint.requestIds:
+            self.endpoint._sendResponse(*result)
+        else:
+            self._sendInOrder(sequence, result)
+
+        with self._lock:
+            if self._stop or not self._requests:
+                self._running -= 1
+                return
+        # give other connections a chance to be served before running the next request
+        self.executor.submit(self._runNext)
+
+    def _sendInOrder(self, sequence: int, result: tuple):
+        # holding the send lock of the endpoint guarantees that responses
+        # popped from `_ready` are sent in the same order they are popped
+        with self.endpoint._sendLock:
+            self._ready[sequence] = result
+            while self._nextToSend in self._ready:
+                result = self._ready.pop(self._nextToSend)
+                self._nextToSend += 1
+                if not self.endpoint._sendResponse(*result):
+                    self.stop()
+                    return
+
+    def stop(self):
+        """
+        drops the requests still waiting to run, running ones are completed
+        """
+        with self._lock:
+            self._stop = True
+            self._requests.clear()
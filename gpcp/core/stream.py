@@ -0,0 +1,186 @@
+"""
+streaming of the responses of commands returning an iterator: the items are sent in
+chunk frames followed by an end frame. The requesting endpoint grants the responding
+one a number of credits, i.e. of chunks it can send before waiting for more credits,
+so that at most that many chunks are ever buffered on the requesting endpoint.
+"""
+from threading import Condition
+from collections import deque
+from typing import Callable, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ResponseStream:
+    """
+    the response of a command returning an iterator, whose items are serialized
+    and encoded lazily, `CHUNK_ITEMS` at a time
+    """
+
+    CHUNK_ITEMS = 64
+
+    def __init__(self, items: Iterable, itemType: type, codec):
+        """
+        :param items: the iterator returned by the command
+        :param itemType: the type used to serialize the items
+        :param codec: the codec used to encode chunks
+        """
+        self.items = items
+        self.itemType = itemType
+        self.codec = codec
+        self.initialCredits = 0
+
+    def chunks(self):
+        """
+        :returns: a generator of encoded chunks, each one a list of items
+        """
+        chunk = []
+        for item in self.items:
+            chunk.append(self.itemType.serialize(item))
+            if len(chunk) >= self.CHUNK_ITEMS:
+                yield self.codec.encodeValue(chunk)
+                chunk = []
+        if chunk:
+            yield self.codec.encodeValue(chunk)
+
+    def collect(self):
+        """
+        :returns: all items encoded as a single list, used when the remote
+                  endpoint can't receive streams
+        """
+        return self.codec.encodeValue([self.itemType.serialize(item) for item in self.items])
+
+    def close(self):
+        if hasattr(self.items, "close"):
+            self.items.close() # e.g. runs the `finally` blocks of a generator stopped early
+
+class StreamWindow:
+    """
+    the credits granted by the requesting endpoint to the endpoint sending a stream
+    """
+
+    def __init__(self, credits: int):
+        self._condition = Condition()
+        self._credits = credits
+        self._cancelled = False
+
+    def add(self, credits: int):
+        """
+        :param credits: the number of new credits, 0 means that the stream was cancelled
+        """
+        with self._condition:
+            if credits == 0:
+                self._cancelled = True
+            self._credits += credits
+            self._condition.notify()
+
+    def cancel(self):
+        self.add(0)
+
+    def take(self) -> bool:
+        """
+        waits for a credit to be available and uses it
+
+        :returns: False if the stream was cancelled
+        """
+        with self._condition:
+            while self._credits == 0 and not self._cancelled:
+                self._condition.wait()
+            if self._cancelled:
+                return False
+            self._credits -= 1
+            return True
+
+class RemoteIterator:
+    """
+    iterates over the items of a stream sent by the remote endpoint, receiving
+    at most `window` chunks ahead of the ones being iterated over
+    """
+
+    def __init__(self, pending, requestId: int, decode: Callable, window: int, sendCredit: Callable):
+        """
+        :param pending: the `gpcp.core.dispatcher.PendingRequests` the stream is registered to
+        :param requestId: the id of the request the stream is the response of
+        :param decode: called with the payload of every chunk to obtain a list of items
+        :param window: the number of chunks the remote endpoint can send in advance
+        :param sendCredit: called with (requestId, credits) to grant credits to the remote
+                           endpoint, with 0 credits if the stream is cancelled
+        """
+        self.pending = pending
+        self.requestId = requestId
+        self.window = window
+        self._decode = decode
+        self._sendCredit = sendCredit
+        self._condition = Condition()
+        self._chunks = deque()
+        self._items = iter(())
+        self._finished = False
+        self._error = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                return next(self._items)
+            except StopIteration:
+                pass # the current chunk is over
+
+            with self._condition:
+                while not self._chunks and not self._finished:
+                    self._condition.wait()
+                if not self._chunks:
+                    if self._error is not None:
+                        raise self._error
+                    raise StopIteration
+                self._items = iter(self._chunks.popleft())
+
+            # the chunk is not buffered anymore, so the remote endpoint can send another one
+            self._grant(1)
+
+    def _grant(self, credits: int):
+        try:
+            self._sendCredit(self.requestId, credits)
+        except (ConnectionError, OSError) as e:
+            logger.debug(f"{e} encountered while sending credits for stream {self.requestId}")
+
+    def onChunk(self, payload):
+        try:
+            items = self._decode(payload)
+        except Exception as e:
+            self.onError(e)
+            return
+        with self._condition:
+            self._chunks.append(items)
+            self._condition.notify()
+
+    def onEnd(self):
+        with self._condition:
+            self._finished = True
+            self._condition.notify()
+
+    def onError(self, error: Exception):
+        with self._condition:
+            self._error = error
+            self._finished = True
+            self._condition.notify()
+
+    def close(self):
+        """
+        stops receiving the stream, if it is not over yet the remote endpoint stops sending it
+        """
+        with self._condition:
+            if self._finished:
+                return
+            self._finished = True
+            self._chunks.clear()
+        self.pending.discard(self.requestId)
+        self._grant(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+        return False # let the caller handle exceptions
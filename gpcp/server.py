@@ -2,8 +2,10 @@ from gpcp.core.base_handler import buildHandlerFromFunction
 from gpcp.utils.handlerValidator import validateHandler, validateNullableHandler
 from gpcp.utils.errors import ConfigurationError
 from gpcp.core.endpoint import EndPoint
+from gpcp.core.reactor import Reactor
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, Callable
-from gpcp.core import packet
+from gpcp.core import packet, process_pool
 import threading
 import socket
 
@@ -15,16 +17,29 @@ class Server:
     gpcp server main class, used for creating and using a server
     """
 
-    def __init__(self, role = "R", handler: Union[type, Callable] = None, reuseAddress: bool = False):
+    def __init__(self, role = "R", handler: Union[type, Callable] = None, reuseAddress: bool = False,
+                 reactor: bool = False, workers: int = None, perConnectionConcurrency: int = 1):
         """
         Initialize server
 
         :param role: the role of the server endpoints
         :param handler: the handler class, usually extending utils.base_handler.BaseHandler
         :param reuseAddress: set if overwrite server on the same port with the current one
+        :param reactor: if True frames for all connections are read by a single thread using
+                        `selectors`, instead of by a dedicated thread for every connection.
+                        Requests are then always run on the pool of `workers` threads.
+        :param workers: the number of threads in the server-wide pool running requests. If None
+                        requests are run on the thread of their connection, one at a time,
+                        unless `reactor` is True, in which case the size of the pool is
+                        decided by `concurrent.futures.ThreadPoolExecutor`.
+        :param perConnectionConcurrency: the maximum number of requests of the same connection
+                        running at once on the pool. Responses are sent as soon as they are
+                        ready if the client supports request ids, in request order otherwise.
+                        Note that handlers must be thread safe if this is more than 1.
         """
 
-        logger.debug(f"__init__() called with role={role}, handler={handler}, reuseAddress={reuseAddress}")
+        logger.debug(f"__init__() called with role={role}, handler={handler}, reuseAddress={reuseAddress}"
+                     + f", reactor={reactor}, workers={workers}, perConnectionConcurrency={perConnectionConcurrency}")
 
         if role not in ["R", "A", "AR", "RA"]:
             raise ConfigurationError(f"invalid role for {self.__class__.__name__}: options are ['A', 'R', 'RA' | 'AR']")
@@ -42,6 +57,18 @@ class Server:
         if reuseAddress:
             self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
+        if not isinstance(reactor, bool):
+            raise ConfigurationError(f"invalid option '{reactor}' for reactor, must be 'True' or 'False'")
+        if workers is not None and (not isinstance(workers, int) or workers <= 0):
+            raise ConfigurationError(f"invalid option '{workers}' for workers, must be a positive integer or None")
+        if not isinstance(perConnectionConcurrency, int) or perConnectionConcurrency <= 0:
+            raise ConfigurationError(f"invalid option '{perConnectionConcurrency}' for perConnectionConcurrency, must be a positive integer")
+        self.useReactor = reactor
+        self.workers = workers
+        self.perConnectionConcurrency = perConnectionConcurrency
+        self.reactor = None
+        self.executor = None
+
         self.running = threading.Event()
 
     def __enter__(self):
@@ -89,6 +116,12 @@ class Server:
         self.socket.bind((host, port))
         self.socket.listen(buffer)
 
+        if self.useReactor or self.workers is not None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gpcp worker")
+        if self.useReactor:
+            self.reactor = Reactor()
+
+        process_pool.acquire()
         self.running.set()
         while self.running.is_set():
             try:
@@ -101,14 +134,15 @@ class Server:
                 handlerInstance = self.handler()
 
                 # initializing the endpoint object and starting the thread
-                endpoint = EndPoint(self, connectionSocket, self.role, handlerInstance)
+                endpoint = EndPoint(self, connectionSocket, self.role, handlerInstance,
+                                    self.reactor, self.executor, self.perConnectionConcurrency)
                 self.connectedEndpoints.append(endpoint)
             except socket.timeout:
                 pass # there is no connection yet
 
             for i, endpoint in enumerate(self.connectedEndpoints):
                 if endpoint.isStopped():
-                    logger.debug(f"connected endpoint thread {endpoint.mainLoopThread.name} is dead, deleting")
+                    logger.debug(f"connected endpoint {endpoint.remoteAddress} is stopped, deleting")
                     del self.connectedEndpoints[i]
 
         # closing all connections, after self.running became unset
@@ -116,6 +150,15 @@ class Server:
             self._terminateEndpoint(endpoint)
         self.connectedEndpoints.clear()
 
+        if self.reactor is not None:
+            self.reactor.stop()
+            self.reactor = None
+        if self.executor is not None:
+            # waits for running requests to complete
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        process_pool.release()
+
         # closing socket, after self.running became unset
         try:
             self.socket.close()
@@ -150,7 +193,8 @@ class Server:
         data = endpoint.handler.onDisonnected(self, endpoint.socket, endpoint.remoteAddress)
         if data is not None:
             try:
-                packet.sendAll(endpoint.socket, data)
+                with endpoint._sendLock:
+                    endpoint._sendFrame(data)
             except (ConnectionError, OSError) as e:
                 logger.error(f"{e} encountered while sending onDisconnected packet to {endpoint.remoteAddress}")
                 pass
@@ -1,6 +1,8 @@
+import collections.abc
 import enum
 import re
 import keyword
+import typing
 from typing import Callable
 from gpcp.utils.base_types import getIfBuiltIn, Bytes
 from gpcp.utils.errors import AnnotationError, ConfigurationError
@@ -12,17 +14,34 @@ class FunctionType(enum.Enum):
     command = 0
     unknown = 1
 
-def command(arg):
+COMMAND_EXECUTORS = ["thread", "process"]
+
+def command(arg = None, *, executor: str = "thread"):
     """
     Marks the decorated function as a command with a string identifier. Also obtains argument types
     and function return value if they are specified with the `def function(argument: type) -> type`
     syntax, defaulting to `Bytes` for non-specified types. Those types are used to automatically
     convert the values passed to the function. Built-in types are supported.
 
+    Commands annotated to return `Iterator[type]` or `Generator[type, ...]` stream their items
+    to the remote endpoint in chunks, instead of sending them all in one response.
+
+    Can be used as `@command`, `@command("identifier")`, `@command(executor="process")` or
+    `@command("identifier", executor="process")`.
+
     :param arg: (optinal) the command identifier for the function,
         defaults to the name of the function if not specified
+    :param executor: where the command is run: "thread" runs it on the thread handling the
+        request, "process" ships the arguments to a managed process pool (see
+        `gpcp.core.process_pool`), so that CPU-bound commands are not serialized by the GIL.
+        Such commands are run on a new instance of the handler class in the worker process,
+        and the handler class must be picklable (i.e. defined at the top level of a module).
     """
 
+    if executor not in COMMAND_EXECUTORS:
+        raise AnnotationError(f"Invalid executor '{executor}': options are {COMMAND_EXECUTORS}")
+    options = {"executor": executor}
+
     def assertIdentifierValid(identifier: str):
         """
         checks if <identifier> is a valid python identifier
@@ -59,11 +78,21 @@ def command(arg):
         """
         Obtains the return type of a function (if specified with `def function() -> type:`)
         defaulting to `NoneType` if the user specified no return type. Built-in types are
-        supported.
+        supported. For iterators the type of the items is returned, defaulting to `Bytes`.
+
+        :returns: (return type, whether the function returns an iterator)
         """
 
         returnType = func.__annotations__.get("return", None)
-        return getIfBuiltIn(returnType)
+        if typing.get_origin(returnType) in (collections.abc.Iterator, collections.abc.Generator):
+            itemTypes = typing.get_args(returnType)
+            return (getIfBuiltIn(itemTypes[0]) if itemTypes else Bytes, True)
+        return (getIfBuiltIn(returnType), False)
+
+    def getMetadata(func: Callable, identifier: str):
+        returnType, stream = getReturnType(func)
+        return (FunctionType.command, identifier, getDescription(func), returnType,
+                getArgumentTypes(func), dict(options, stream=stream))
 
     def getDescription(func: Callable):
         if func.__doc__ is None:
@@ -77,17 +106,19 @@ def command(arg):
     # `@command` used without parameters
     if callable(arg):
         assertIdentifierValid(arg.__name__)
-        arg.__gpcp_metadata__ = (FunctionType.command, arg.__name__, getDescription(arg),
-                                 getReturnType(arg), getArgumentTypes(arg))
+        arg.__gpcp_metadata__ = getMetadata(arg, arg.__name__)
         logger.debug(f"@command(): assigned metadata to {arg.__name__}: {arg.__gpcp_metadata__}")
         return arg
 
-    # `@command` used with name parameter (e.g. @command("start"))
-    assertIdentifierValid(arg)
+    # `@command` used with name parameter (e.g. @command("start")) and/or with options
+    if arg is not None:
+        assertIdentifierValid(arg)
     def wrapper(func: Callable):
-        func.__gpcp_metadata__ = (FunctionType.command, arg, getDescription(func),
-                                  getReturnType(func), getArgumentTypes(func))
-        logger.debug(f"@command(\"{arg}\"): assigned metadata to {func.__name__}: {func.__gpcp_metadata__}")
+        identifier = func.__name__ if arg is None else arg
+        if arg is None:
+            assertIdentifierValid(identifier)
+        func.__gpcp_metadata__ = getMetadata(func, identifier)
+        logger.debug(f"@command(\"{identifier}\"): assigned metadata to {func.__name__}: {func.__gpcp_metadata__}")
         return func
     return wrapper # the returned function when called adds the metadata to `func` and returns it
 
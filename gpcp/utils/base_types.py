@@ -26,13 +26,16 @@ class JsonBuiltinType(TypeBase):
         return entry
 
 class Bytes(TypeBase):
+    # bytes are sent raw by the binary codec, and as ascii text by the json codec
     @staticmethod
     def serialize(value):
-        return value.decode("ascii")
+        return value
 
     @staticmethod
     def deserialize(entry):
-        return entry.encode("ascii")
+        if isinstance(entry, str):
+            return entry.encode("ascii")
+        return entry
 
 class String(JsonBuiltinType):
     pass
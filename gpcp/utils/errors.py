@@ -24,3 +24,14 @@ class UnmetPreconditionError(Exception):
     function annotated as `@gpcp.utils.annotations.unknownCommand`
     does not return bytes.
     """
+
+class RemoteError(Exception):
+    """
+    Raised on the requesting endpoint when the remote endpoint failed to
+    handle a request, e.g. because the command raised an exception.
+    `errorType` holds the kind of error reported by the remote endpoint.
+    """
+
+    def __init__(self, errorType: str, message: str):
+        super().__init__(f"{errorType}: {message}")
+        self.errorType = errorType
@@ -0,0 +1,56 @@
+import time
+import asyncio
+import threading
+import gpcp
+
+HOST = "127.0.0.1"
+PORT = 9137
+CLIENTS = 200
+SECONDS = 2
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        async def waitSomeTime(self) -> None:
+            await asyncio.sleep(SECONDS)
+
+        @gpcp.command
+        def double(self, a: str) -> str:
+            return a + a
+
+    global server
+    server = gpcp.aio.Server(handler=ServerHandler)
+    asyncio.run(server.startServer(HOST, PORT, buffer=CLIENTS))
+
+async def runClient(i):
+    async with gpcp.aio.Client(HOST, PORT) as client:
+        await client.loadInterface(client)
+        assert await client.double(str(i)) == str(i) * 2
+        # many requests in flight on the same connection
+        results = await asyncio.gather(*[client.double(str(j)) for j in range(10)])
+        assert results == [str(j) * 2 for j in range(10)]
+        await client.waitSomeTime()
+
+async def runClients():
+    await asyncio.gather(*[runClient(i) for i in range(CLIENTS)])
+
+def test_aio(reraise):
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.2) # make sure the server has started
+
+    # all clients wait at the same time, and are served by a single thread
+    startTime = time.time()
+    asyncio.run(runClients())
+    takenTime = time.time() - startTime
+    assert takenTime < 3 * SECONDS
+
+    # the threaded client speaks the same protocol
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+        assert client.double("abc") == "abcabc"
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
@@ -0,0 +1,92 @@
+import time
+import json
+import socket
+import threading
+import gpcp
+from gpcp.core import packet
+from gpcp.core.codec import BinaryCodec, JsonCodec
+
+HOST = "0.0.0.0"
+PORT = 9142
+
+VALUES = [
+    None, True, False, 0, -1, 127, 128, -129, 2**31, -2**63, 2**64, -2**100, 1.5, -0.0,
+    "", "short", "é" * 300, b"\x00\xff", [], [1, [2.5, "a"]], {"a": {"b": [None]}, "c": 3},
+]
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        def double(self, a: str) -> str:
+            return a + a
+
+        @gpcp.command
+        def sum(self, values: list) -> int:
+            return sum(values)
+
+        @gpcp.command
+        def echo(self, value: dict) -> dict:
+            return value
+
+        @gpcp.command
+        def reverse(self, data: bytes) -> bytes:
+            assert isinstance(data, bytes)
+            return data[::-1]
+
+    global server
+    with gpcp.Server(handler=ServerHandler) as server:
+        server.startServer(HOST, PORT)
+
+def runJsonOnlyPeer():
+    # a peer which does not send "codecs" in its config only speaks json
+    with socket.create_connection(("127.0.0.1", PORT)) as sock:
+        packet.sendAll(sock, json.dumps({"role": "A"}))
+        remoteConfig = json.loads(str(packet.receiveAll(sock)[0], packet.ENCODING))
+        assert JsonCodec.NAME in remoteConfig["codecs"]
+
+        packet.sendAll(sock, packet.CommandData.encode("double", ["ab"]), isRequest=True)
+        data, isRequest = packet.receiveAll(sock)
+        assert not isRequest
+        assert json.loads(str(data, packet.ENCODING)) == "abab"
+
+        # bytes are sent as ascii text with the json codec
+        packet.sendAll(sock, packet.CommandData.encode("reverse", [b"abc"]), isRequest=True)
+        data, _ = packet.receiveAll(sock)
+        assert json.loads(str(data, packet.ENCODING)) == "cba"
+
+def test_codec(reraise):
+    for value in VALUES:
+        assert BinaryCodec.decodeValue(BinaryCodec.encodeValue(value)) == value
+    assert BinaryCodec.decodeValue(BinaryCodec.encodeValue((1, "a"))) == [1, "a"]
+    assert BinaryCodec.decodeRequest(BinaryCodec.encodeRequest(3, ["a", 1])) == (3, ["a", 1])
+
+    # big bytes are referenced by their own segment instead of being copied
+    blob = bytes(range(256)) * 1024
+    segments = BinaryCodec.encodeRequest(3, [blob, "after"])
+    assert isinstance(segments, list) and segments[1].obj is blob
+    assert BinaryCodec.decodeRequest(b"".join(segments)) == (3, [blob, "after"])
+
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    with gpcp.Client(HOST, PORT) as client:
+        assert client.codec is BinaryCodec
+        client.loadInterface(client)
+        assert isinstance(client.double.commandId, int)
+
+        assert client.double("abc") == "abcabc"
+        assert client.sum([1, 2**40, -3]) == 2**40 - 2
+        assert client.echo({"a": [1.5, None, True], "b": "c"}) == {"a": [1.5, None, True], "b": "c"}
+        # bytes travel raw, so they need not be ascii
+        assert client.reverse(b"\x00\xff\x80") == b"\x80\xff\x00"
+        assert client.reverse(blob) == blob[::-1]
+        # commands can still be called by name
+        assert client.commandRequest("double", ["x"]) == "xx"
+
+    runJsonOnlyPeer()
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
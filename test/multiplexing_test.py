@@ -0,0 +1,61 @@
+import time
+import threading
+import gpcp
+from gpcp.utils.errors import RemoteError
+
+HOST = "0.0.0.0"
+PORT = 9139
+THREADS = 16
+CALLS = 100
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        def double(self, a: str) -> str:
+            return a + a
+
+        @gpcp.command
+        def fail(self) -> None:
+            raise ValueError("failing on purpose")
+
+    global server
+    with gpcp.Server(handler=ServerHandler) as server:
+        server.startServer(HOST, PORT)
+
+def runThread(client, i):
+    for j in range(CALLS):
+        assert client.double(f"{i}-{j}") == f"{i}-{j}{i}-{j}"
+
+def test_multiplexing(reraise):
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    with gpcp.Client(HOST, PORT) as client:
+        assert client.requestIds
+        client.loadInterface(client)
+
+        # many threads sharing the same client
+        threads = [threading.Thread(target=reraise.wrap(runThread), args=(client, i), daemon=True)
+                   for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # pipelined requests
+        futures = [client.commandRequestAsync("double", [str(i)]) for i in range(CALLS)]
+        assert [future.result() for future in futures] == [str(i) * 2 for i in range(CALLS)]
+
+        # errors are reported to the caller and the connection keeps working
+        try:
+            client.fail()
+            assert False
+        except RemoteError as e:
+            assert e.errorType == "ValueError"
+        assert client.double("abc") == "abcabc"
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
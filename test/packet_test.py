@@ -0,0 +1,36 @@
+import socket
+import threading
+from gpcp.core import packet
+
+def test_packet():
+    # lengths not fitting in 24 bits are encoded correctly in the header
+    for length, isRequest in [(0, False), (13, True), (0x1234567, True), (0x7fffffff, False)]:
+        assert packet.Header.decode(packet.Header.encode(length, isRequest)) == (length, isRequest)
+
+    pool = packet.BufferPool()
+    view = pool.acquire(1000)
+    assert len(view) == 1000
+    buffer = view.obj
+    pool.release(view)
+    assert pool.acquire(600).obj is buffer # same size class, reused
+
+    sender, receiver = socket.socketpair()
+    data = bytes(range(256)) * (12 * 1024) # 3MB, sent in many fragments
+    thread = threading.Thread(target=lambda: (packet.sendBuffers(sender, [b"head", data], isRequest=True),
+                                              packet.sendAll(sender, "small")))
+    thread.start()
+
+    frame, isRequest = packet.receiveAll(receiver)
+    assert isRequest
+    assert isinstance(frame, memoryview)
+    assert frame[:4] == b"head" and frame[4:] == data
+    packet.bufferPool.release(frame)
+
+    frame, isRequest = packet.receiveAll(receiver)
+    assert not isRequest
+    assert frame == b"small"
+
+    thread.join()
+    sender.close()
+    assert packet.receiveAll(receiver) == (None, None)
+    receiver.close()
@@ -0,0 +1,62 @@
+import os
+import time
+import threading
+import gpcp
+from gpcp.utils.errors import HandlerLoadingError
+
+HOST = "0.0.0.0"
+PORT = 9141
+CLIENTS = 4
+
+# handlers with commands run in processes must be picklable, i.e. defined at the top level
+class ServerHandler(gpcp.BaseHandler):
+    @gpcp.command(executor="process")
+    def fibonacci(self, i: int) -> int:
+        def fib(x):
+            if x < 2:
+                return 1
+            else:
+                return fib(x-1) + fib(x-2)
+        return fib(i)
+
+    @gpcp.command(executor="process")
+    def processId(self) -> int:
+        return os.getpid()
+
+def runServer():
+    global server
+    with gpcp.Server(handler=ServerHandler) as server:
+        server.startServer(HOST, PORT)
+
+def runClient():
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+        assert client.fibonacci(20) == 10946
+        assert client.processId() != os.getpid()
+
+def test_processPool(reraise):
+    class LocalHandler(gpcp.BaseHandler):
+        @gpcp.command(executor="process")
+        def local(self) -> None:
+            pass
+
+    try:
+        LocalHandler.loadHandlers()
+        assert False
+    except HandlerLoadingError:
+        pass
+
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    clientThreads = [threading.Thread(target=reraise.wrap(runClient), daemon=True) for i in range(CLIENTS)]
+    for thread in clientThreads:
+        thread.start()
+    for thread in clientThreads:
+        thread.join()
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
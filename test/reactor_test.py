@@ -0,0 +1,56 @@
+import time
+import threading
+import gpcp
+
+HOST = "0.0.0.0"
+PORT = 9138
+SECONDS = 2
+CLIENTS = 20
+WORKERS = 4
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        def waitSomeTime(self) -> None:
+            time.sleep(SECONDS)
+
+        @gpcp.command
+        def anotherCommand(self, a: str) -> str:
+            return a + a
+
+    global server
+    with gpcp.Server(handler=ServerHandler, reactor=True, workers=WORKERS) as server:
+        server.startServer(HOST, PORT, buffer=CLIENTS)
+
+def runClient(i):
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+        for j in range(50):
+            assert client.anotherCommand(f"{i}-{j}") == f"{i}-{j}{i}-{j}"
+        if i < WORKERS:
+            client.waitSomeTime()
+        assert client.anotherCommand("abcd") == "abcdabcd"
+
+
+def test_reactor(reraise):
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    clientThreads = [threading.Thread(target=reraise.wrap(runClient), args=(i,), daemon=True) for i in range(CLIENTS)]
+    for thread in clientThreads:
+        thread.start()
+
+    startTime = time.time()
+    for thread in clientThreads:
+        thread.join()
+    takenTime = time.time() - startTime
+    assert takenTime < 2 * SECONDS
+
+    # the server only uses the reactor thread and the worker pool, not 2 threads per connection
+    assert len([t for t in threading.enumerate() if t.name.startswith("gpcp")]) <= WORKERS + 1
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
@@ -0,0 +1,82 @@
+import time
+import asyncio
+import threading
+from typing import Iterator, Generator
+import gpcp
+from gpcp.core.stream import ResponseStream
+from gpcp.utils.errors import RemoteError
+
+HOST = "0.0.0.0"
+PORT = 9143
+ITEMS = 1000
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        def numbers(self, n: int) -> Iterator[int]:
+            global produced
+            for i in range(n):
+                produced += 1
+                yield i
+
+        @gpcp.command
+        def words(self) -> Generator[str, None, None]:
+            yield "a"
+            yield "b"
+            raise ValueError("failing on purpose")
+
+        @gpcp.command
+        def double(self, a: str) -> str:
+            return a + a
+
+    global server
+    # streams keep a worker busy, so other requests of the connection need another one
+    with gpcp.Server(handler=ServerHandler, workers=4, perConnectionConcurrency=2) as server:
+        server.startServer(HOST, PORT)
+
+async def runAioClient():
+    # without request ids all items are received at once
+    async with gpcp.aio.Client("127.0.0.1", PORT) as client:
+        await client.loadInterface(client)
+        assert list(await client.numbers(10)) == list(range(10))
+
+def test_stream(reraise):
+    global produced
+    produced = 0
+
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+        assert list(client.numbers(ITEMS)) == list(range(ITEMS))
+
+        # other requests can be made on the same connection while iterating
+        for i in client.numbers(ITEMS):
+            if i % 200 == 0:
+                assert client.double(str(i)) == str(i) * 2
+
+        # the server does not produce more items than the client can buffer
+        produced = 0
+        with client.commandRequestStream("numbers", [ITEMS], window=2) as numbers:
+            assert next(numbers) == 0
+            time.sleep(0.2)
+            assert produced <= 4 * ResponseStream.CHUNK_ITEMS
+        assert list(client.numbers(3)) == [0, 1, 2]
+
+        # errors raised while iterating are reported after the items already sent
+        words = client.words()
+        assert next(words) == "a" and next(words) == "b"
+        try:
+            next(words)
+            assert False
+        except RemoteError as e:
+            assert e.errorType == "ValueError"
+
+    asyncio.run(runAioClient())
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1
@@ -0,0 +1,62 @@
+import time
+import asyncio
+import threading
+import gpcp
+
+HOST = "0.0.0.0"
+PORT = 9140
+SECONDS = 2
+WORKERS = 8
+
+def runServer():
+    class ServerHandler(gpcp.BaseHandler):
+        @gpcp.command
+        def waitSomeTime(self, seconds: float) -> float:
+            time.sleep(seconds)
+            return seconds
+
+        @gpcp.command
+        def anotherCommand(self, a: str) -> str:
+            return a + a
+
+    global server
+    with gpcp.Server(handler=ServerHandler, workers=WORKERS, perConnectionConcurrency=4) as server:
+        server.startServer(HOST, PORT)
+
+async def runLegacyClient():
+    # the asyncio client does not use request ids, so responses must come back in order
+    async with gpcp.aio.Client("127.0.0.1", PORT) as client:
+        await client.loadInterface(client)
+        results = await asyncio.gather(client.waitSomeTime(0.5), client.waitSomeTime(0.1),
+                                       client.anotherCommand("a"), client.waitSomeTime(0))
+        assert results == [0.5, 0.1, "aa", 0]
+
+def test_workers(reraise):
+    serverThread = threading.Thread(target=reraise.wrap(runServer), daemon=True)
+    serverThread.start()
+
+    time.sleep(0.1) # make sure the server has started
+
+    with gpcp.Client(HOST, PORT) as client:
+        client.loadInterface(client)
+
+        # a slow command does not block the following ones on the same connection
+        startTime = time.time()
+        slow = client.commandRequestAsync("waitSomeTime", [SECONDS])
+        assert client.anotherCommand("abc") == "abcabc"
+        assert time.time() - startTime < SECONDS / 2
+        assert not slow.done()
+
+        # at most 4 commands of the same connection run at once
+        startTime = time.time()
+        futures = [client.commandRequestAsync("waitSomeTime", [SECONDS / 4]) for i in range(6)]
+        for future in futures:
+            future.result()
+        assert slow.result() == SECONDS
+        assert SECONDS / 2 <= time.time() - startTime < SECONDS * 1.5
+
+    asyncio.run(runLegacyClient())
+
+    server.stopServer()
+    serverThread.join()
+    assert len(threading._active.items()) == 1